@@ -0,0 +1,76 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+CATALOG_TAG_KEY = "catalog_tag:{tag}"
+CATALOG_RESPONSE_KEY = "catalog_response:{view}:{action}:{versions}:{path}"
+EXAM_CONTENT_TAG = "exam_content:{exam_id}"
+
+
+def bump_catalog_tags(*tags):
+    """
+    invalidate every cached response built from these tags, after the transaction commits.
+    a bump inside the transaction lets a reader cache the old rows under the new version
+    """
+    def bump():
+        for tag in tags:
+            key = CATALOG_TAG_KEY.format(tag=tag)
+            if not cache.add(key, time.time_ns(), timeout=None):
+                cache.incr(key)
+
+    transaction.on_commit(bump)
+
+
+def get_catalog_tag_versions(tags):
+    keys = [CATALOG_TAG_KEY.format(tag=tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # start an evicted tag from a fresh value, so old responses are never reused
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return ".".join(str(versions[key]) for key in keys)
+
+
+class CatalogListCacheMixin:
+    """
+    caches the rendered json of list for data that is the same for every user.
+    `cache_tags` are bumped by post_save/post_delete signals of the models the response is built from.
+    """
+    cache_tags = ()
+    cache_timeout = 60 * 60 * 24
+
+    def get_cache_tags(self):
+        return self.cache_tags
+
+    def get_cache_key(self, request):
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return CATALOG_RESPONSE_KEY.format(
+            view=self.__class__.__name__,
+            action=getattr(self, "action", request.method.lower()),
+            versions=get_catalog_tag_versions(self.get_cache_tags()),
+            path=path,
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content, content_type="application/json")
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, JSONRenderer().render(response.data), timeout=self.cache_timeout)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+
+class CatalogListRetrieveCacheMixin(CatalogListCacheMixin):
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
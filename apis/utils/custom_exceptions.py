@@ -124,3 +124,27 @@ class EmailAlreadyExists(APIException):
     status_code = 400
     default_detail = "ایمیل کاربری از قبل وجود دارد"
     default_code = "email_already_exists"
+
+
+class JudgeInProgressException(APIException):
+    status_code = 403
+    default_detail = "ارسال قبلی شما برای این چالش هنوز در حال داوری است"
+    default_code = "judge_in_progress"
+
+
+class GatewayUnavailable(APIException):
+    status_code = 503
+    default_detail = "درگاه پرداخت در دسترس نیست، کمی بعد دوباره تلاش کنید"
+    default_code = "gateway_unavailable"
+
+
+class IdempotencyInProgress(APIException):
+    status_code = 409
+    default_detail = "درخواست قبلی با همین کلید هنوز در حال انجام است"
+    default_code = "idempotency_in_progress"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = 422
+    default_detail = "این کلید قبلا برای درخواست دیگری استفاده شده است"
+    default_code = "idempotency_key_reused"
@@ -0,0 +1,150 @@
+import asyncio
+import functools
+import hashlib
+import time
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django_redis import get_redis_connection
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.renderers import JSONRenderer
+
+from .custom_exceptions import IdempotencyKeyReused, IdempotencyInProgress
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_RESPONSE_KEY = "idempotency:{view}:{user_id}:{key}"
+IDEMPOTENCY_LOCK_KEY = "idempotency_lock:{view}:{user_id}:{key}"
+# duplicates within the window get the first response
+IDEMPOTENCY_WINDOW = 60 * 60 * 24
+# longer than a gateway request with its retries, a crashed worker does not block the key for long
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_WAIT_TIMEOUT = 30
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+
+# deletes the lock only while it still holds our token, a holder whose lock expired
+# does not delete the lock of the request that took over
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_release_script = None
+
+idempotency_key_header = OpenApiParameter(
+    name=IDEMPOTENCY_HEADER,
+    type=str,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description="retries with the same key get the response of the first request",
+)
+
+
+def _acquire_lock(lock_key, token):
+    return bool(get_redis_connection("default").set(lock_key, token, nx=True, ex=IDEMPOTENCY_LOCK_TIMEOUT))
+
+
+def _release_lock(lock_key, token):
+    global _release_script
+    if _release_script is None:
+        _release_script = get_redis_connection("default").register_script(RELEASE_LOCK_SCRIPT)
+    _release_script(keys=[lock_key], args=[token])
+
+
+class _IdempotentRequest:
+    """keys, fingerprint and the saved response of one request that carries an Idempotency-Key"""
+
+    def __init__(self, view, request):
+        key = request.headers.get(IDEMPOTENCY_HEADER, "")
+        self.enabled = bool(key)
+        key = hashlib.sha256(key.encode()).hexdigest()
+        names = {"view": view.__class__.__name__, "user_id": request.user.id, "key": key}
+        self.response_key = IDEMPOTENCY_RESPONSE_KEY.format(**names)
+        self.lock_key = IDEMPOTENCY_LOCK_KEY.format(**names)
+        self.token = uuid4().hex
+        self.fingerprint = hashlib.sha256(JSONRenderer().render(request.data)).hexdigest() if self.enabled else None
+
+    def replay(self, saved):
+        # the same key with another body is a client bug, not a retry
+        if saved["fingerprint"] != self.fingerprint:
+            raise IdempotencyKeyReused()
+        response = HttpResponse(saved["content"], status=saved["status"], content_type="application/json")
+        response["Idempotent-Replayed"] = "true"
+        return response
+
+    def to_save(self, response):
+        # server errors are not saved, the retry runs the request again
+        if response.status_code >= 500:
+            return None
+        return {
+            "fingerprint": self.fingerprint,
+            "status": response.status_code,
+            "content": JSONRenderer().render(response.data),
+        }
+
+
+def idempotent(handler):
+    """
+    saves the first response of a POST that has an Idempotency-Key header and replays it for duplicates.
+    a concurrent duplicate waits on a short lock instead of running the handler a second time.
+    works on sync and async handlers, requests without the header are not touched
+    """
+    if asyncio.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def async_wrapper(self, request, *args, **kwargs):
+            state = _IdempotentRequest(self, request)
+            if not state.enabled:
+                return await handler(self, request, *args, **kwargs)
+
+            deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+            while True:
+                saved = await cache.aget(state.response_key)
+                if saved is not None:
+                    return state.replay(saved)
+                if await sync_to_async(_acquire_lock, thread_sensitive=False)(state.lock_key, state.token):
+                    break
+                if time.monotonic() > deadline:
+                    raise IdempotencyInProgress()
+                await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+            try:
+                response = await handler(self, request, *args, **kwargs)
+                saved = state.to_save(response)
+                if saved is not None:
+                    await cache.aset(state.response_key, saved, timeout=IDEMPOTENCY_WINDOW)
+                return response
+            finally:
+                await sync_to_async(_release_lock, thread_sensitive=False)(state.lock_key, state.token)
+
+        return async_wrapper
+
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        state = _IdempotentRequest(self, request)
+        if not state.enabled:
+            return handler(self, request, *args, **kwargs)
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            saved = cache.get(state.response_key)
+            if saved is not None:
+                return state.replay(saved)
+            if _acquire_lock(state.lock_key, state.token):
+                break
+            if time.monotonic() > deadline:
+                raise IdempotencyInProgress()
+            time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+            saved = state.to_save(response)
+            if saved is not None:
+                cache.set(state.response_key, saved, timeout=IDEMPOTENCY_WINDOW)
+            return response
+        finally:
+            _release_lock(state.lock_key, state.token)
+
+    return wrapper
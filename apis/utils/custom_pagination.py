@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination, BasePagination
 
 
 class TwentyPageNumberPagination(PageNumberPagination):
@@ -9,3 +9,80 @@ class ScrollPagination(PageNumberPagination):
     page_size = 20
     max_page_size = 100
     page_size_query_param = 'page_size'
+
+
+class TwentyCursorPagination(CursorPagination):
+    page_size = 20
+    ordering = "-id"
+
+
+class ScrollCursorPagination(CursorPagination):
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    ordering = "-id"
+
+
+class PageNumberOrCursorPagination(BasePagination):
+    """
+    page number pagination for old clients, keyset pagination (no count, no offset)
+    when the client sends ?cursor= (empty for the first page) or ?pagination=cursor.
+    the cursor ordering comes from `cursor_ordering` on the view and must match the view ordering.
+    """
+    page_number_class = ScrollPagination
+    cursor_class = ScrollCursorPagination
+    pagination_query_param = "pagination"
+
+    def __init__(self):
+        self.paginator = None
+
+    def use_cursor(self, request):
+        query_params = request.query_params
+        return (
+            self.cursor_class.cursor_query_param in query_params
+            or query_params.get(self.pagination_query_param) == "cursor"
+        )
+
+    def get_paginator(self, request, view):
+        if not self.use_cursor(request):
+            return self.page_number_class()
+
+        paginator = self.cursor_class()
+        paginator.ordering = getattr(view, "cursor_ordering", paginator.ordering)
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request, view)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = self.page_number_class().get_schema_operation_parameters(view)
+        names = {parameter["name"] for parameter in parameters}
+        parameters += [
+            parameter for parameter in self.cursor_class().get_schema_operation_parameters(view)
+            if parameter["name"] not in names
+        ]
+        parameters.append({
+            "name": self.pagination_query_param,
+            "required": False,
+            "in": "query",
+            "description": "cursor --> keyset pagination without page count",
+            "schema": {"type": "string", "enum": ["cursor"]},
+        })
+        return parameters
+
+
+class ScrollOrCursorPagination(PageNumberOrCursorPagination):
+    page_number_class = ScrollPagination
+    cursor_class = ScrollCursorPagination
+
+
+class TwentyPageNumberOrCursorPagination(PageNumberOrCursorPagination):
+    page_number_class = TwentyPageNumberPagination
+    cursor_class = TwentyCursorPagination
@@ -1,10 +1,8 @@
 import datetime
-import secrets
 import time
 
 from django.db.models import Prefetch
 from pytz import timezone as pytz_timezone
-from django.core.cache import cache
 from adrf.views import APIView as AsyncAPIView
 from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
@@ -16,6 +14,7 @@ from asgiref.sync import sync_to_async
 from apps.auth_app.models import User, Student
 from base.utils.custom_throttle import OtpRateThrottle
 from base.utils.grand_section_access import grant_mobile_sections_access
+from base.utils.otp_store import issue_otp, verify_otp, OTP_VERIFIED
 from apps.challenge_app.models import UserChallengeScore
 from apps.core_app.models import Photo
 from apps.subscription_app.models import UserSubscription
@@ -31,7 +30,6 @@ from apis.utils.custom_permissions import AsyncRemoveAuthenticationPermissions,
 from apis.utils.custom_response import response
 from base.settings import SIMPLE_JWT
 from ...utils.custom_exceptions import UserBlockException
-from ...utils.custom_ip import get_client_ip
 from apps.auth_app.tasks import send_otp_sms_celery
 
 
@@ -53,11 +51,8 @@ class RequestOtpView(APIView):
             user = User.objects.create_user(mobile_phone=phone)
             Student.objects.acreate(user_id=user.id)
 
-        # set key in redis
-        get_ip = get_client_ip(request)
-        random_code = ''.join(str(secrets.randbelow(10)) for _ in range(6))
-        redis_key = f'{phone}_{get_ip}_{random_code}'
-        cache.set(redis_key, random_code, timeout=120)
+        # one record per phone in redis, a new request replaces the previous code
+        random_code, expires_at = issue_otp(phone)
 
         # send otp sms by celery
         send_otp_sms_celery.delay(phone, random_code)
@@ -65,7 +60,7 @@ class RequestOtpView(APIView):
         # return response
         data = {
             "mobile": phone,
-            "exp_time": int(time.time() + 120)
+            "exp_time": expires_at
         }
         return response(
             status=True,
@@ -87,11 +82,8 @@ class OtpVerifyView(AsyncAPIView):
         phone = serializer.validated_data['mobile_phone']
         otp = serializer.validated_data['otp']
 
-        # get in redis
-        get_ip = get_client_ip(request)
-        redis_key = f'{phone}_{get_ip}_{otp}'
-        get_redis_key = await cache.aget(redis_key)
-        if get_redis_key is None:
+        # check and consume in redis, wrong codes count against the phone
+        if await sync_to_async(verify_otp)(phone, otp) != OTP_VERIFIED:
             return response(
                 status=False,
                 message="کد اشتباه یا منقضی شد هست",
@@ -122,7 +114,6 @@ class OtpVerifyView(AsyncAPIView):
                     "expire_timestamp_access_token": expire_timestamp,
                     "expire_date_access_token": expire_date
                 }
-                await cache.adelete(redis_key)
                 await sync_to_async(grant_mobile_sections_access)(user.id) # access two section into user
                 return response(
                     status=True,
@@ -1,7 +1,7 @@
-from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, BooleanFilter
 
-from apps.challenge_app.models import Challenge, ChallengeSubmission
+from apps.challenge_app.models import Challenge
+from base.utils.solved_challenge_cache import solved_challenge_cache
 
 
 class ChallengeFilter(FilterSet):
@@ -15,14 +15,9 @@ class ChallengeFilter(FilterSet):
         }
 
     def filter_is_accepted(self, queryset, name, value):
-        solve_subquery = ChallengeSubmission.objects.filter(
-            user_id=self.request.user.id,
-            challenge=OuterRef('pk'),
-            is_active=True,
-            status="accepted"
-        )
+        solved_ids = solved_challenge_cache.get(self.request.user.id)
 
         if value:
-            return queryset.filter(Exists(solve_subquery))
+            return queryset.filter(id__in=solved_ids)
         else:
-            return queryset.filter(~Exists(solve_subquery))
\ No newline at end of file
+            return queryset.exclude(id__in=solved_ids)
@@ -1,11 +1,21 @@
-from django.db.models import  F
+from django.db import transaction
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from rest_framework.exceptions import NotFound
 
 from apis.utils.custom_exceptions import ChallengeBlockedException, ChallengeBlockTwoException, \
-    PreventSendSubmitChallengeException
-from apps.challenge_app.models import Challenge, ChallengeSubmission, UserChallengeScore
+    PreventSendSubmitChallengeException, JudgeInProgressException
+from apps.challenge_app.models import Challenge, ChallengeSubmission
+from apps.challenge_app.tasks import judge_submission
+from base.utils.challenge_submission import (
+    JUDGE_STATUSES,
+    lock_user_score,
+    has_finished_submission,
+    is_judged,
+    record_submission_result,
+    upsert_challenge_progress,
+)
+from base.utils.judge_cache import judge_result_key, get_judge_result
 
 
 class ListChallengeSerializer(serializers.ModelSerializer):
@@ -33,7 +43,7 @@ class ListChallengeSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.BooleanField())
     def get_is_accepted(self, obj):
-        return obj.is_accepted
+        return obj.id in self.context["solved_challenge_ids"]
 
 
 # class TestCateChallengeSerializer(serializers.ModelSerializer):
@@ -64,106 +74,135 @@ class DetailChallengeSerializer(ListChallengeSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        is_accepted = instance.is_accepted
-        if is_accepted is False:
+        if not data["is_accepted"]:
             data['answer'] = None
         return data
 
 
 class SubmitChallengeSerializer(serializers.ModelSerializer):
+    """
+    status --> result computed by the client, only for challenges without a judge and for solved \n
+    source_code --> judged on the server (PY), the submission stays pending until the judge finishes
+    """
     class Meta:
         model = ChallengeSubmission
         fields = (
             "id",
-            'status'
+            'status',
+            "source_code",
+            "execution_time",
         )
+        extra_kwargs = {
+            "source_code": {"write_only": True},
+            "execution_time": {"read_only": True},
+        }
 
     def validate(self, attrs):
-        check_submit_challenge = ChallengeSubmission.objects.filter(
-            is_active=True,
-            user_id=self.context["request"].user.id,
-            challenge_id=self.context["challenge_id"],
-            status__in=['accepted', 'solved']
-        ).only("id")
-        if check_submit_challenge.exists():
-            raise PreventSendSubmitChallengeException()
+        if not attrs.get("source_code") and not attrs.get("status"):
+            raise serializers.ValidationError("status یا source_code را ارسال کنید")
         return attrs
 
-    def _create_user_submit(self, user_id, challenge_id):
-        ChallengeSubmission.objects.create(
-            challenge_id=challenge_id,
-            is_active=True,
-            user_id=user_id
-        )
-
     def create(self, validated_data):
         user_id = self.context["request"].user.id
         challenge_id = self.context["challenge_id"]
-        status = validated_data.get("status")
-
-        # check challenge
-        challenge = Challenge.objects.filter(id=challenge_id, is_active=True).only("id", "points")
-        if not challenge.exists():
-            raise NotFound("چالش مورد نظر پیدا نشد")
-
-        # get challenge
-        get_challenge = challenge.last()
-
-        # check user score
-        user_score = UserChallengeScore.objects.filter(user_id=user_id).only("id", "total_score")
-
-        # check user_submit and create
-        user_submit = ChallengeSubmission.objects.filter(
-            challenge_id=challenge_id,
+        source_code = validated_data.get("source_code")
+        status = validated_data.get("status", "pending")
+
+        with transaction.atomic():
+            # get challenge
+            challenge = Challenge.objects.filter(id=challenge_id, is_active=True).only(
+                "id", "points", "answer", "language"
+            ).first()
+            if not challenge:
+                raise NotFound("چالش مورد نظر پیدا نشد")
+
+            user_score = lock_user_score(user_id)
+
+            # check submit challenge under the lock
+            if has_finished_submission(user_id, challenge_id):
+                raise PreventSendSubmitChallengeException()
+
+            judged = is_judged(challenge)
+            if source_code:
+                return self._create_judge_submission(user_id, challenge, user_score, judged, source_code)
+            if judged and status != "solved":
+                raise serializers.ValidationError({"source_code": "برای این چالش باید کد را ارسال کنید"})
+
+            # nothing is written when the user can not see the answer
+            if status == "solved":
+                if user_score.total_score <= 0:
+                    raise ChallengeBlockedException()
+                elif user_score.total_score < challenge.points:
+                    raise ChallengeBlockTwoException()
+
+            # create user submit with its final status
+            user_submit = ChallengeSubmission.objects.create(
+                challenge=challenge,
+                user_id=user_id,
+                is_active=True,
+                status=status,
+                score=challenge.points if status == "accepted" else 0
+            )
+            record_submission_result(self.context["request"].user, challenge, user_score, status)
+            upsert_challenge_progress(user_submit.id, user_id, challenge.id, status, user_submit.score)
+        return user_submit
+
+    def _create_judge_submission(self, user_id, challenge, user_score, judged, source_code):
+        if not judged:
+            raise serializers.ValidationError({"source_code": "داوری خودکار برای این چالش فعال نیست"})
+
+        if ChallengeSubmission.objects.filter(
             is_active=True,
             user_id=user_id,
-        ).only("status")
-        self._create_user_submit(user_id, challenge_id)
-
-        if status == "solved":
-            # update total_submissions challenge
-            challenge.update(total_submissions=F("total_submissions") + 1)
-
-            # get user submit and save status
-            get_user_submit = user_submit.last()
-            get_user_submit.status = "solved"
-            get_user_submit.save()
-
-            if user_score.first().total_score <= 0:
-                raise ChallengeBlockedException()
-            elif user_score.first().total_score < get_challenge.points:
-                raise ChallengeBlockTwoException()
-            else:
-                user_score.update(total_score=F("total_score") - get_challenge.points)
-                return user_submit
-
-        elif status == "accepted":
-            get_points = challenge.first().points
-            user_score.update(total_score=F("total_score") + get_challenge.points)
-
-            # get user submit and save status
-            get_user_submit = user_submit.last()
-            get_user_submit.status = "accepted"
-            get_user_submit.score = get_points
-            get_user_submit.save()
-
-            # update successful_submissions and total_submissions challenge
-            challenge.update(successful_submissions=F("successful_submissions") + 1, total_submissions=F("total_submissions") + 1)
+            challenge_id=challenge.id,
+            status__in=JUDGE_STATUSES
+        ).exists():
+            raise JudgeInProgressException()
+
+        # same code was judged before against the same test set
+        cached_result = get_judge_result(judge_result_key(challenge, source_code))
+        if cached_result:
+            user_submit = ChallengeSubmission.objects.create(
+                challenge=challenge,
+                user_id=user_id,
+                is_active=True,
+                status=cached_result["status"],
+                score=challenge.points if cached_result["status"] == "accepted" else 0,
+                source_code=source_code,
+                execution_time=cached_result["execution_time"],
+                test_results=cached_result["test_results"],
+            )
+            record_submission_result(
+                self.context["request"].user, challenge, user_score, cached_result["status"], cached_result["execution_time"]
+            )
+            upsert_challenge_progress(user_submit.id, user_id, challenge.id, user_submit.status, user_submit.score)
             return user_submit
 
-        else:
-            # get user submit and save status
-            get_user_submit = user_submit.last()
-            get_user_submit.status = status
-            get_user_submit.save()
-
-            # update total_submissions challenge
-            challenge.update(total_submissions=F("total_submissions") + 1)
-            return user_submit
+        user_submit = ChallengeSubmission.objects.create(
+            challenge=challenge,
+            user_id=user_id,
+            is_active=True,
+            status="pending",
+            source_code=source_code
+        )
+        transaction.on_commit(lambda: judge_submission.delay(user_submit.id))
+        return user_submit
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['status'] = instance.values("status")[0]['status']
         if data['status'] == "solved":
-            data['answer'] = instance.last().challenge.answer
+            data['answer'] = instance.challenge.answer
         return data
+
+
+class LeaderboardEntrySerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
+    user_id = serializers.IntegerField()
+    full_name = serializers.CharField(allow_null=True)
+    total_score = serializers.FloatField()
+
+
+class LeaderboardMeSerializer(serializers.Serializer):
+    board = serializers.CharField()
+    rank = serializers.IntegerField(allow_null=True)
+    total_score = serializers.FloatField(allow_null=True)
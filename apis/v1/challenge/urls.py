@@ -1,13 +1,14 @@
 from django.urls import path
 from rest_framework.routers import SimpleRouter
 
-from .views import ChallengeViewSet, SubmitChallengeView
+from .views import ChallengeViewSet, SubmitChallengeView, LeaderboardViewSet
 
 app_name = "v1_challenge"
 
 router = SimpleRouter()
 
 router.register("list", ChallengeViewSet, basename="challenge")
+router.register("leaderboard", LeaderboardViewSet, basename="leaderboard")
 
 urlpatterns = [
     path("list/<int:pk>/submit/", SubmitChallengeView.as_view(), name="submit-challenge"),
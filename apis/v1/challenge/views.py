@@ -1,15 +1,20 @@
-from django.db.models import Exists, OuterRef
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, views
-from rest_framework.exceptions import NotAcceptable
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotAcceptable, NotFound, ValidationError
 from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated
 from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
 
-from apps.challenge_app.models import Challenge, ChallengeSubmission
+from apps.auth_app.models import User
+from apps.challenge_app.models import Challenge
+from base.utils import leaderboard
+from base.utils.solved_challenge_cache import solved_challenge_cache
 from .filters import ChallengeFilter
-from .serializers import ListChallengeSerializer, DetailChallengeSerializer, SubmitChallengeSerializer
-from ...utils.custom_pagination import ScrollPagination
+from .serializers import ListChallengeSerializer, DetailChallengeSerializer, SubmitChallengeSerializer, \
+    LeaderboardEntrySerializer, LeaderboardMeSerializer
+from ...utils.custom_pagination import ScrollOrCursorPagination
 from ...utils.custom_response import response
 
 
@@ -17,27 +22,30 @@ class ChallengeViewSet(viewsets.ReadOnlyModelViewSet):
     """
     filter_class \n
     level --> (easy, easy, medium, hard, expert) \n
-    language --> (PY, JA, HTML, C#, JS, C++)
+    language --> (PY, JA, HTML, C#, JS, C++) \n
+    cursor pagination --> ?cursor= or ?pagination=cursor
     """
     filterset_class = ChallengeFilter
-    pagination_class = ScrollPagination
+    pagination_class = ScrollOrCursorPagination
+    cursor_ordering = "id"
     permission_classes = (IsAuthenticated,)
     ordering_fields = ("id",)
     filter_backends = (OrderingFilter, DjangoFilterBackend)
 
-    def check_user_submission(self):
-        solve_subquery = ChallengeSubmission.objects.filter(
-            user_id=self.request.user.id,
-            challenge=OuterRef('pk'),
-            is_active=True,
-            status="accepted"
-        ).only("id")
-        return solve_subquery
+    def get_solved_challenge_ids(self):
+        if getattr(self, "swagger_fake_view", False):
+            return set()
+        if not hasattr(self, "_solved_challenge_ids"):
+            self._solved_challenge_ids = solved_challenge_cache.get(self.request.user.id)
+        return self._solved_challenge_ids
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["solved_challenge_ids"] = self.get_solved_challenge_ids()
+        return context
 
     def get_queryset(self):
-        base_query = Challenge.objects.filter(is_active=True, status='published').select_related("image").annotate(
-                is_accepted=Exists(self.check_user_submission()),
-        )
+        base_query = Challenge.objects.filter(is_active=True, status='published').select_related("image")
         base_fields = ("name", "level", "success_percent", "successful_submissions", "points", "coins", "language", "image__image", "image__width", "image__height",)
         detail_field = base_fields + ("description", "answer")
         # test_cases_fields = ("input_data", "expected_output", "order", "challenge_id")
@@ -80,3 +88,90 @@ class SubmitChallengeView(views.APIView):
             message=_("پردازش با موفقت انجام شد"),
             data=serializer.data
         )
+
+
+board_param = OpenApiParameter(
+    name="board",
+    type=str,
+    enum=leaderboard.BOARDS,
+    location=OpenApiParameter.QUERY,
+    description="board of the current user, default global"
+)
+
+
+class LeaderboardViewSet(viewsets.ViewSet):
+    """
+    board --> (global, state, city, school), state/city/school of the current user \n
+    top --> ?limit= (max 100) \n
+    around_me --> ?radius= (max 25)
+    """
+    permission_classes = (IsAuthenticated,)
+    max_limit = 100
+    max_radius = 25
+
+    def get_board(self):
+        board = self.request.query_params.get("board", "global")
+        if board not in leaderboard.BOARDS:
+            raise ValidationError({"board": f"board must be one of {', '.join(leaderboard.BOARDS)}"})
+
+        board_name = leaderboard.board_of_user(self.request.user, board)
+        if board_name is None:
+            raise NotFound("اطلاعات این جدول در پروفایل شما ثبت نشده است")
+        return board_name
+
+    def get_int_param(self, name, default, maximum):
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            raise ValidationError({name: "must be a number"})
+        return min(max(value, 1), maximum)
+
+    def get_entries(self, ranked):
+        users = User.objects.only("first_name", "last_name").in_bulk([user_id for _, user_id, _ in ranked])
+        return [
+            {
+                "rank": rank,
+                "user_id": user_id,
+                "full_name": users[user_id].get_full_name if user_id in users else None,
+                "total_score": total_score,
+            }
+            for rank, user_id, total_score in ranked
+        ]
+
+    def leaderboard_response(self, data):
+        return response(
+            status_code=200,
+            status=True,
+            error=False,
+            message=_("پردازش با موفقت انجام شد"),
+            data=data
+        )
+
+    @extend_schema(
+        parameters=[board_param, OpenApiParameter(name="limit", type=int, location=OpenApiParameter.QUERY)],
+        responses=LeaderboardEntrySerializer(many=True)
+    )
+    @action(detail=False, methods=["get"])
+    def top(self, request):
+        ranked = leaderboard.get_top(self.get_board(), self.get_int_param("limit", 10, self.max_limit))
+        return self.leaderboard_response(LeaderboardEntrySerializer(self.get_entries(ranked), many=True).data)
+
+    @extend_schema(parameters=[board_param], responses=LeaderboardMeSerializer)
+    @action(detail=False, methods=["get"])
+    def me(self, request):
+        board = self.get_board()
+        rank, total_score = leaderboard.get_rank(board, request.user.id)
+        return self.leaderboard_response(
+            LeaderboardMeSerializer({"board": board, "rank": rank, "total_score": total_score}).data
+        )
+
+    @extend_schema(
+        parameters=[board_param, OpenApiParameter(name="radius", type=int, location=OpenApiParameter.QUERY)],
+        responses=LeaderboardEntrySerializer(many=True)
+    )
+    @action(detail=False, methods=["get"])
+    def around_me(self, request):
+        ranked = leaderboard.get_around(
+            self.get_board(), request.user.id, self.get_int_param("radius", 5, self.max_radius)
+        )
+        return self.leaderboard_response(LeaderboardEntrySerializer(self.get_entries(ranked), many=True).data)
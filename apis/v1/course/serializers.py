@@ -1,3 +1,5 @@
+from django.db import transaction, IntegrityError
+from django.db.models import F
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
@@ -9,6 +11,7 @@ from apps.auth_app.models import Student
 from apps.core_app.models import Attachment
 from apps.course_app.models import Category, LessonCourse, Section, SectionVideo, CategoryComment, CommentAttachment
 from apps.exam_app.models import SectionExam, Question, Choice, StudentExamAttempt, StudentAnswer
+from base.utils.exam_answer_key import get_exam_answer_key
 
 
 class ListCategorySerializer(serializers.ModelSerializer):
@@ -85,7 +88,7 @@ class SectionLessonCourseSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.BooleanField())
     def get_has_access(self, obj):
-        return obj.has_access
+        return obj.id in self.context["access_section_ids"]
 
     @extend_schema_field(serializers.URLField())
     def get_section_image(self, obj):
@@ -125,7 +128,7 @@ class DetailSectionLessonCourseSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.BooleanField())
     def get_has_access(self, obj):
-        return obj.has_access
+        return obj.id in self.context["access_section_ids"]
 
     @extend_schema_field(serializers.URLField())
     def get_cover_image_url(self ,obj):
@@ -206,6 +209,8 @@ class ListDetailStudentExamAttemptSerializer(serializers.ModelSerializer):
             "submitted_at",
             "total_score",
             "obtained_score",
+            "answered_count",
+            "correct_count",
             "passing_score",
             "is_passed",
             "status"
@@ -215,7 +220,57 @@ class ListDetailStudentExamAttemptSerializer(serializers.ModelSerializer):
         return obj.exam.total_score
 
 
-class StudentAnswerSerializer(serializers.ModelSerializer):
+class AnswerGradingMixin:
+    """auto correct answers from the cached answer key of the exam"""
+
+    def _get_question_key(self, exam_id, question_id):
+        question_key = get_exam_answer_key(exam_id).get(str(question_id))
+        if question_key is None:
+            raise NotFound("سوال یافت نشد")
+        return question_key
+
+    def _grade_multiple_choice_question(self, student_answer, question_key, selected_ids):
+        """
+        تصحیح خودکار سوالات چهارگزینه‌ای
+        """
+        is_correct = (set(selected_ids) == set(question_key["correct_choices"]))
+
+        student_answer.score = question_key["score"] if is_correct else 0
+        student_answer.is_correct = is_correct
+        student_answer.graded_at = timezone.now()
+
+    def _auto_correct_question_code(self, status, question_key, student_answer):
+        if status == "accepted":
+            student_answer.is_correct = True
+            student_answer.score = question_key["score"]
+        elif status == "reject":
+            student_answer.is_correct = False
+            student_answer.score = 0
+        student_answer.status = status
+        student_answer.graded_at = timezone.now()
+
+    def _lock_open_attempt(self, attempt_id):
+        """
+        lock the attempt until the answer is saved, ExamDone waits for it and counts its score.
+        an attempt closed in the meantime does not take answers
+        """
+        if not StudentExamAttempt.objects.select_for_update().filter(
+            id=attempt_id,
+            submitted_at__isnull=True,
+            status="in_progress"
+        ).exists():
+            raise PermissionDenied("نمی‌توانید به آزمون تمام شده پاسخ دهید")
+
+    def _update_attempt_score(self, attempt_id, score=0, correct=0, answered=0):
+        """apply a graded answer to the running totals of the attempt"""
+        StudentExamAttempt.objects.filter(id=attempt_id).update(
+            obtained_score=F("obtained_score") + score,
+            correct_count=F("correct_count") + correct,
+            answered_count=F("answered_count") + answered,
+        )
+
+
+class StudentAnswerSerializer(AnswerGradingMixin, serializers.ModelSerializer):
     class Meta:
         model = StudentAnswer
         fields = (
@@ -247,19 +302,20 @@ class StudentAnswerSerializer(serializers.ModelSerializer):
         status = attrs.get("status", None)
 
         # check question is code or multiple_choice
-        check_question = Question.objects.filter(
-            id=question_id, is_active=True, exam_id=exam_id
-        ).only("id", "question_type", "score").first()
-        if not check_question:
-            raise NotFound("سوال یافت شد")
+        question_key = self._get_question_key(exam_id, question_id)
 
-        if check_question.question_type == "multiple_choice" and not selected_choices:
+        if question_key["question_type"] == "multiple_choice" and not selected_choices:
             raise PermissionDenied("فقط امکان ارسال سوال چهارگزینه ای رو دارید")
-        if check_question.question_type == "code" and not status:
+        if question_key["question_type"] == "code" and not status:
             raise PermissionDenied("فقط امکان ارسال سوال کد رو دارید")
 
         # check duplicate student answer
-        get_attempts = StudentExamAttempt.objects.filter(student__user_id=user_id, exam_id=exam_id).only("id").last()
+        get_attempts = StudentExamAttempt.objects.filter(
+            student__user_id=user_id,
+            exam_id=exam_id,
+            submitted_at__isnull=True,
+            status="in_progress"
+        ).only("id").last()
         if not get_attempts:
             raise NotFound("ازمون پیدا نشد")
         if StudentAnswer.objects.filter(
@@ -270,12 +326,12 @@ class StudentAnswerSerializer(serializers.ModelSerializer):
             raise PermissionDenied("شما قبلا جواب رو ارسال کردید نمیتوانید جواب جدیدی رو ایجاد کنید میتوانید ان را ویرایش کنید")
 
         attrs['get_attempts'] =get_attempts
-        attrs["question"] = check_question
+        attrs["question_key"] = question_key
         return attrs
 
     def create(self, validated_data):
         user_id = self.context['request'].user.id
-        question = validated_data.pop("question")
+        question_key = validated_data.pop("question_key")
         get_attempts = validated_data.pop("get_attempts")
         status = validated_data.pop("status", None)
 
@@ -284,59 +340,38 @@ class StudentAnswerSerializer(serializers.ModelSerializer):
 
         # create student answer
         selected_choices = validated_data.pop("selected_choices", [])
-        student_answer =  StudentAnswer.objects.create(
-            question_id=question.id,
+        student_answer = StudentAnswer(
+            question_id=self.context['question_pk'],
             student_id=get_student.id,
             attempt_id=get_attempts.id,
             **validated_data
         )
 
-        # set choices
-        student_answer.selected_choices.set(selected_choices)
-
         # auto correct
-        if question.question_type == "multiple_choice":
-            # auto correct
-            self._grade_multiple_choice_question(student_answer, question, selected_choices)
-        if question.question_type == "code":
-            self._auto_correct_question_code(status=status, question=question, student_answer=student_answer)
-        return student_answer
-
-    def _grade_multiple_choice_question(self, student_answer, question, selected_choices):
-        """
-        تصحیح خودکار سوالات چهارگزینه‌ای
-        """
-        correct_choices = Choice.objects.filter(
-            is_active=True,
-            is_correct=True,
-            question_id=question.id,
-        ).values_list("id", flat=True)
-
-        selected_ids = {choice.id for choice in selected_choices}
-        correct_set = set(correct_choices)
-
-        is_correct = (selected_ids == correct_set)
+        if question_key["question_type"] == "multiple_choice":
+            self._grade_multiple_choice_question(
+                student_answer, question_key, {choice.id for choice in selected_choices}
+            )
+        if question_key["question_type"] == "code":
+            self._auto_correct_question_code(status=status, question_key=question_key, student_answer=student_answer)
 
-        score = question.score if is_correct else 0
+        with transaction.atomic():
+            self._lock_open_attempt(get_attempts.id)
+            student_answer.save()
 
-        student_answer.score = score
-        student_answer.is_correct = is_correct
-        student_answer.graded_at = timezone.now()
-        student_answer.save()
+            # set choices
+            student_answer.selected_choices.set(selected_choices)
 
-    def _auto_correct_question_code(self, status, question, student_answer):
-        if status == "accepted":
-            student_answer.is_correct = True
-            student_answer.graded_at = timezone.now()
-            student_answer.score = question.score
-            student_answer.status = status
-        else:
-            student_answer.status = status
-            student_answer.graded_at = timezone.now()
-        student_answer.save()
+            self._update_attempt_score(
+                get_attempts.id,
+                score=student_answer.score,
+                correct=int(bool(student_answer.is_correct)),
+                answered=1
+            )
+        return student_answer
 
 
-class UpdateStudentAnswerSerializer(serializers.ModelSerializer):
+class UpdateStudentAnswerSerializer(AnswerGradingMixin, serializers.ModelSerializer):
     class Meta:
         model = StudentAnswer
         fields = (
@@ -362,26 +397,21 @@ class UpdateStudentAnswerSerializer(serializers.ModelSerializer):
         status = attrs.get("status", None)
 
         # دریافت سوال مربوطه
-        check_question = Question.objects.filter(
-            id=question_id, is_active=True, exam_id=exam_id
-        ).only("id", "question_type", "score").first()
-
-        if not check_question:
-            raise NotFound("سوال یافت نشد")
+        question_key = self._get_question_key(exam_id, question_id)
 
         # بررسی نوع سوال و فیلدهای ارسالی
-        if check_question.question_type == "multiple_choice" and not selected_choices:
+        if question_key["question_type"] == "multiple_choice" and not selected_choices:
             raise PermissionDenied("برای سوال چهارگزینه‌ای باید گزینه‌ها را انتخاب کنید")
 
-        if check_question.question_type == "code" and not status:
+        if question_key["question_type"] == "code" and not status:
             raise PermissionDenied("برای سوال کد باید وضعیت را مشخص کنید")
 
-        attrs["question"] = check_question
+        attrs["question_key"] = question_key
         return attrs
 
     def update(self, instance, validated_data):
         user_id = self.context['request'].user.id
-        question = instance.question
+        question_key = validated_data.pop("question_key")
 
         # دریافت فیلدهای قابل اپدیت
         selected_choices = validated_data.pop('selected_choices', None)
@@ -390,21 +420,39 @@ class UpdateStudentAnswerSerializer(serializers.ModelSerializer):
         # بررسی مجوزهای اپدیت
         self._check_update_permissions(instance, user_id)
 
-        # اپدیت فیلدهای معمولی
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+        with transaction.atomic():
+            # قفل آزمون قبل از پاسخ، ترتیب قفل ها مثل ثبت پاسخ
+            self._lock_open_attempt(instance.attempt_id)
+
+            # نمره قبلی پاسخ، قفل شده تا تصحیح همزمان دوبار حساب نشود
+            previous = StudentAnswer.objects.select_for_update().filter(
+                id=instance.id
+            ).values("score", "is_correct").first()
+
+            # اپدیت فیلدهای معمولی
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
 
-        # اپدیت گزینه‌های انتخاب شده اگر ارسال شده باشد
-        if selected_choices is not None:
-            instance.selected_choices.set(selected_choices)
+            # اپدیت گزینه‌های انتخاب شده اگر ارسال شده باشد
+            if selected_choices is not None:
+                instance.selected_choices.set(selected_choices)
 
-        # تصحیح خودکار پس از اپدیت
-        if question.question_type == "multiple_choice" and selected_choices is not None:
-            self._grade_multiple_choice_question(instance, question, selected_choices)
-        elif question.question_type == "code" and status is not None:
-            self._auto_correct_question_code(status, question, instance)
+            # تصحیح خودکار پس از اپدیت
+            if question_key["question_type"] == "multiple_choice" and selected_choices is not None:
+                self._grade_multiple_choice_question(
+                    instance, question_key, {choice.id for choice in selected_choices}
+                )
+            elif question_key["question_type"] == "code" and status is not None:
+                self._auto_correct_question_code(status, question_key, instance)
+
+            instance.save()
 
-        instance.save()
+            # اعمال تغییر نمره روی آزمون
+            self._update_attempt_score(
+                instance.attempt_id,
+                score=instance.score - previous["score"],
+                correct=int(bool(instance.is_correct)) - int(bool(previous["is_correct"]))
+            )
         return instance
 
     def _check_update_permissions(self, instance, user_id):
@@ -421,43 +469,6 @@ class UpdateStudentAnswerSerializer(serializers.ModelSerializer):
         if not instance.question.is_active:
             raise PermissionDenied("این سوال غیرفعال است")
 
-    def _grade_multiple_choice_question(self, student_answer, question, selected_choices):
-        """
-        تصحیح خودکار سوالات چهارگزینه‌ای
-        """
-        correct_choices = Choice.objects.filter(
-            is_active=True,
-            is_correct=True,
-            question_id=question.id,
-        ).values_list("id", flat=True)
-
-        selected_ids = {choice.id for choice in selected_choices}
-        correct_set = set(correct_choices)
-
-        is_correct = (selected_ids == correct_set)
-        score = question.score if is_correct else 0
-
-        student_answer.score = score
-        student_answer.is_correct = is_correct
-        student_answer.graded_at = timezone.now()
-        student_answer.save()
-
-    def _auto_correct_question_code(self, status, question, student_answer):
-        if status == "accepted":
-            student_answer.is_correct = True
-            student_answer.graded_at = timezone.now()
-            student_answer.score = question.score
-            student_answer.status = status
-        elif status == "reject":
-            student_answer.is_correct = False
-            student_answer.graded_at = timezone.now()
-            student_answer.score = 0
-            student_answer.status = status
-        else:
-            student_answer.status = status
-            student_answer.graded_at = timezone.now()
-        student_answer.save()
-
 
 class CommentAttachmentSerializer(serializers.ModelSerializer):
     file_link = serializers.SerializerMethodField()
@@ -598,3 +609,122 @@ class UpdateCategoryCommentSerializer(serializers.ModelSerializer):
 
 class ExamDoneSerializer(serializers.Serializer):
     exam_id = serializers.IntegerField()
+
+
+class StudentAnswerItemSerializer(serializers.Serializer):
+    question = serializers.IntegerField()
+    selected_choices = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=True)
+    status = serializers.ChoiceField(choices=StudentAnswer.STATUS_CHOICES, required=False)
+
+
+class BulkStudentAnswerResultSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StudentAnswer
+        fields = (
+            "id",
+            "question",
+            "status",
+            "score",
+            "graded_at",
+            "is_correct",
+        )
+
+
+class BulkStudentAnswerSerializer(AnswerGradingMixin, serializers.Serializer):
+    """all answers of an exam attempt in one request"""
+    answers = StudentAnswerItemSerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        exam_id = self.context['exam_pk']
+        user_id = self.context['request'].user.id
+
+        # active attempt
+        attempt = StudentExamAttempt.objects.filter(
+            student__user_id=user_id,
+            exam_id=exam_id,
+            submitted_at__isnull=True,
+            status='in_progress'
+        ).only("id", "student_id").last()
+        if not attempt:
+            raise NotFound("ازمون پیدا نشد")
+
+        # questions and their choices of this exam
+        answer_key = get_exam_answer_key(exam_id)
+
+        # already answered questions
+        answered_ids = set(
+            StudentAnswer.objects.filter(attempt_id=attempt.id).values_list("question_id", flat=True)
+        )
+
+        errors = {}
+        seen_ids = set()
+        for index, answer in enumerate(attrs["answers"]):
+            question_id = answer["question"]
+            question_key = answer_key.get(str(question_id))
+            selected_choices = set(answer.get("selected_choices") or [])
+
+            if question_key is None:
+                errors[index] = "سوال یافت نشد"
+            elif question_id in seen_ids:
+                errors[index] = "برای هر سوال فقط یک جواب میتوانید ارسال کنید"
+            elif question_id in answered_ids:
+                errors[index] = "شما قبلا جواب رو ارسال کردید نمیتوانید جواب جدیدی رو ایجاد کنید میتوانید ان را ویرایش کنید"
+            elif question_key["question_type"] == "multiple_choice" and not selected_choices:
+                errors[index] = "فقط امکان ارسال سوال چهارگزینه ای رو دارید"
+            elif question_key["question_type"] == "code" and not answer.get("status"):
+                errors[index] = "فقط امکان ارسال سوال کد رو دارید"
+            elif not selected_choices <= set(question_key["choices"]):
+                errors[index] = "گزینه انتخاب شده برای این سوال نیست"
+            else:
+                seen_ids.add(question_id)
+                answer["question_key"] = question_key
+                answer["selected_choices"] = selected_choices
+        if errors:
+            raise serializers.ValidationError({"answers": errors})
+
+        attrs["attempt"] = attempt
+        return attrs
+
+    def create(self, validated_data):
+        attempt = validated_data["attempt"]
+
+        student_answers = []
+        for answer in validated_data["answers"]:
+            question_key = answer["question_key"]
+            student_answer = StudentAnswer(
+                student_id=attempt.student_id,
+                attempt_id=attempt.id,
+                question_id=answer["question"],
+            )
+            if question_key["question_type"] == "multiple_choice":
+                self._grade_multiple_choice_question(student_answer, question_key, answer["selected_choices"])
+            elif question_key["question_type"] == "code":
+                self._auto_correct_question_code(answer["status"], question_key, student_answer)
+            student_answers.append(student_answer)
+
+        try:
+            with transaction.atomic():
+                self._lock_open_attempt(attempt.id)
+                StudentAnswer.objects.bulk_create(student_answers)
+
+                # selected choices through rows
+                through_model = StudentAnswer.selected_choices.through
+                through_model.objects.bulk_create([
+                    through_model(studentanswer_id=student_answer.id, choice_id=choice_id)
+                    for student_answer, answer in zip(student_answers, validated_data["answers"])
+                    for choice_id in answer["selected_choices"]
+                ])
+
+                self._update_attempt_score(
+                    attempt.id,
+                    score=sum(student_answer.score for student_answer in student_answers),
+                    correct=sum(1 for student_answer in student_answers if student_answer.is_correct),
+                    answered=len(student_answers)
+                )
+        except IntegrityError:
+            # a concurrent request answered one of the questions after validate, unique (attempt, question)
+            raise serializers.ValidationError(
+                {"answers": "شما قبلا جواب رو ارسال کردید نمیتوانید جواب جدیدی رو ایجاد کنید میتوانید ان را ویرایش کنید"}
+            )
+
+        return student_answers
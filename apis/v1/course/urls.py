@@ -40,5 +40,6 @@ urlpatterns = [
             ),
             name='student-answer-detail'
         ),
+    path('exam/<int:exam_pk>/bulk_answer/', views.BulkStudentAnswerView.as_view(), name='exam_bulk_answer'),
     path("exam_done/", views.ExamDoneView.as_view(), name="exam_done"),
 ] + router.urls + lesson_course_router.urls + category_router.urls
@@ -1,5 +1,5 @@
 from django.db import transaction
-from django.db.models import Prefetch, Exists, OuterRef, Sum
+from django.db.models import Prefetch
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema, OpenApiParameter, extend_schema_view
 from rest_framework import mixins, viewsets, permissions
@@ -8,11 +8,11 @@ from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
-from apps.auth_app.models import Student
 from apps.core_app.models import Attachment
 from apps.exam_app.models import SectionExam, Question, Choice, StudentExamAttempt, StudentAnswer
 from apps.course_app.models import Category, LessonCourse, Section, StudentAccessSection, SectionVideo, CategoryComment, \
     CommentAttachment
+from base.utils.section_access_cache import section_access_cache
 from .filters import StudentExamAttemptFilter, LessonCourseFilter
 from .serializers import (
     CreateStudentExamAttemptSerializer,
@@ -26,15 +26,23 @@ from .serializers import (
     ListClassSerializer,
     ExamQuestionSerializer,
     SectionLessonCourseSerializer,
-    DetailSectionLessonCourseSerializer, UpdateStudentAnswerSerializer, ExamDoneSerializer
+    DetailSectionLessonCourseSerializer, UpdateStudentAnswerSerializer, ExamDoneSerializer,
+    BulkStudentAnswerSerializer, BulkStudentAnswerResultSerializer
 )
-from ...utils.custom_pagination import TwentyPageNumberPagination, ScrollPagination
+from ...utils.custom_cache import CatalogListCacheMixin, CatalogListRetrieveCacheMixin, EXAM_CONTENT_TAG
+from ...utils.custom_pagination import TwentyPageNumberOrCursorPagination, ScrollOrCursorPagination
 from ...utils.custom_permissions import IsOwnerOrReadOnly
 from ...utils.custom_response import response
 
 
-class ListDetailCategoryView(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+class ListDetailCategoryView(
+    CatalogListRetrieveCacheMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet
+):
     serializer_class = ListCategorySerializer
+    cache_tags = ("category",)
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     queryset = Category.objects.filter(
         is_active=True
@@ -43,16 +51,24 @@ class ListDetailCategoryView(mixins.ListModelMixin, mixins.RetrieveModelMixin, v
     )
 
 
-class ListLessonClassView(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+class ListLessonClassView(
+    CatalogListRetrieveCacheMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet
+):
     """
     page_size = 20
     max_page_size = 100
     page_size_query_param = 'page_size'
+    cursor pagination --> ?cursor= or ?pagination=cursor
     """
     serializer_class = ListClassSerializer
     permission_classes = (permissions.IsAuthenticated,)
-    pagination_class = ScrollPagination
+    pagination_class = ScrollOrCursorPagination
+    cursor_ordering = "-id"
     filterset_class = LessonCourseFilter
+    cache_tags = ("category", "course", "lesson_course", "photo")
 
     def get_queryset(self):
         return LessonCourse.objects.filter(
@@ -110,11 +126,23 @@ class SectionLessonCourseViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixi
     def get_object(self):
         obj = super().get_object()
 
-        if not obj.has_access:
+        if obj.id not in self.get_access_section_ids():
             raise PermissionDenied("شما به این بخش دسترسی ندارید")
 
         return obj
 
+    def get_access_section_ids(self):
+        if getattr(self, "swagger_fake_view", False):
+            return set()
+        if not hasattr(self, "_access_section_ids"):
+            self._access_section_ids = section_access_cache.get(self.request.user.id)
+        return self._access_section_ids
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["access_section_ids"] = self.get_access_section_ids()
+        return context
+
     def get_queryset(self):
         # if getattr(self, 'swagger_fake_view', False):
         #     return Question.objects.none()
@@ -122,15 +150,7 @@ class SectionLessonCourseViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixi
         base_query = Section.objects.filter(
             is_active=True,
             course__lesson_course__exact=self.kwargs["lesson_course_pk"]
-        ).select_related("cover_image").annotate(
-                has_access=Exists(
-                    StudentAccessSection.objects.filter(
-                        section_id=OuterRef("id"),
-                        student__user_id=self.request.user.id,
-                        is_access=True
-                    )
-                )
-            )
+        ).select_related("cover_image")
         if self.action == "list":
             return base_query.only(
                 "title",
@@ -178,29 +198,36 @@ class SectionLessonCourseViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixi
         return super().get_serializer_class()
 
 
-class QuestionView(ListAPIView):
+class QuestionView(CatalogListCacheMixin, ListAPIView):
+    """
+    questions of the exam are the same for every student, so the rendered list is cached
+    per exam content version and only the active attempt is checked per request
+    """
     serializer_class = ExamQuestionSerializer
     permission_classes = (IsAuthenticated,)
 
-    def get_queryset(self):
-        user_id = self.request.user.id
-        exam_id = self.kwargs["exam_pk"]
+    def get_cache_tags(self):
+        return (EXAM_CONTENT_TAG.format(exam_id=self.kwargs["exam_pk"]),)
 
-        # Cache the result to avoid duplicate queries
-        if not hasattr(self, '_has_active_attempt'):
-            self._has_active_attempt = StudentExamAttempt.objects.filter(
-                student__user_id=user_id,
-                exam_id=exam_id,
-                submitted_at__isnull=True,
-                status='in_progress'
-            ).exists()
+    def check_active_attempt(self):
+        has_active_attempt = StudentExamAttempt.objects.filter(
+            student__user_id=self.request.user.id,
+            exam_id=self.kwargs["exam_pk"],
+            submitted_at__isnull=True,
+            status='in_progress'
+        ).exists()
 
-        if not self._has_active_attempt:
+        if not has_active_attempt:
             raise PermissionDenied(detail="شما در آزمون شرکت نکرده اید")
 
+    def list(self, request, *args, **kwargs):
+        self.check_active_attempt()
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
         return Question.objects.filter(
             is_active=True,
-            exam_id=exam_id,
+            exam_id=self.kwargs["exam_pk"],
         ).select_related("exam").only(
             "question_text", "question_type", "score", "display_order", "explanation", "exam__passing_score"
         ).prefetch_related(
@@ -212,6 +239,7 @@ class QuestionView(ListAPIView):
             )
         )
 
+
 class StudentExamAttemptView(
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -222,15 +250,17 @@ class StudentExamAttemptView(
     شروع ازمون \n
     filter query --> (in_progress, done) \n
     filter query, is_passed --> bool (true, false) \n
-    pagination --> 20 item
+    pagination --> 20 item \n
+    cursor pagination --> ?cursor= or ?pagination=cursor
     """
     serializer_class = ListDetailStudentExamAttemptSerializer
     permission_classes = (IsAuthenticated,)
     filterset_class = StudentExamAttemptFilter
-    pagination_class = TwentyPageNumberPagination
+    pagination_class = TwentyPageNumberOrCursorPagination
+    cursor_ordering = "-id"
 
     def get_queryset(self):
-        fields = ('exam__passing_score', "started_at", "exam__total_score", "submitted_at", "obtained_score", "is_passed", "status")
+        fields = ('exam__passing_score', "started_at", "exam__total_score", "submitted_at", "obtained_score", "answered_count", "correct_count", "is_passed", "status")
         return StudentExamAttempt.objects.filter(
             student__user_id=self.request.user.id,
         ).select_related("exam").only(*fields).order_by("-id")
@@ -275,6 +305,30 @@ class StudentAnswerViewSet(
             return super().get_serializer_class()
 
 
+class BulkStudentAnswerView(APIView):
+    """
+    submit all answers of the active attempt at once, graded in one pass
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = BulkStudentAnswerSerializer
+
+    @extend_schema(responses=BulkStudentAnswerResultSerializer(many=True))
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(
+            data=request.data,
+            context={"request": request, "exam_pk": kwargs["exam_pk"]}
+        )
+        serializer.is_valid(raise_exception=True)
+        student_answers = serializer.save()
+        return response(
+            error=False,
+            status_code=201,
+            data=BulkStudentAnswerResultSerializer(student_answers, many=True).data,
+            message="پاسخ ها با موفقیت ثبت شد",
+            status=True
+        )
+
+
 common_params = [
     OpenApiParameter(
         name='id',
@@ -308,10 +362,11 @@ list_params = [
 class CategoryCommentViewSet(viewsets.ModelViewSet):
     """
     pagination --> 20 item \n
-    scroll pagination --> (page_size = 20 max_page_size = 100 page_size_query_param = 'page_size')
-
+    scroll pagination --> (page_size = 20 max_page_size = 100 page_size_query_param = 'page_size') \n
+    cursor pagination --> ?cursor= or ?pagination=cursor
     """
-    pagination_class = ScrollPagination
+    pagination_class = ScrollOrCursorPagination
+    cursor_ordering = "-id"
     permission_classes = (IsOwnerOrReadOnly,)
 
     def get_serializer_class(self):
@@ -376,17 +431,6 @@ class ExamDoneView(APIView):
     permission_classes = (IsAuthenticated,)
     serializer_class = ExamDoneSerializer
 
-    def _calc_exam_score(self, exam_attempt_id, user_id):
-        student_answer_score = StudentAnswer.objects.filter(
-            is_active=True,
-            student__user_id=user_id,
-            attempt_id=exam_attempt_id,
-            is_correct=True
-        ).only("score").aggregate(
-            sum_score=Sum("score")
-        )
-        return student_answer_score
-
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -394,49 +438,56 @@ class ExamDoneView(APIView):
         exam_id = serializer.validated_data["exam_id"]
 
         with transaction.atomic():
-            # import ipdb
-            # ipdb.set_trace()
             exam_last = StudentExamAttempt.objects.filter(
                 exam_id=exam_id,
                 is_active=True,
                 student__user_id=request.user.id,
                 submitted_at__isnull=True,
                 status="in_progress"
-            ).select_related("exam__section").only(
-                "exam__total_score", "exam__passing_score", "exam__section__is_last_section", "exam__section__course_id"
+            ).select_for_update(of=("self",)).select_related("exam__section").only(
+                "student_id",
+                "obtained_score",
+                "exam__passing_score",
+                "exam__section__is_last_section",
+                "exam__section__course_id"
             ).last()
             if not exam_last:
                 raise PermissionDenied("شما ازمون فعالی رو ندارید")
-            else:
-                # sum student answer score
-                student_answer_score = self._calc_exam_score(exam_last.id, request.user.id)
-                sum_score = student_answer_score['sum_score']
-
-                # check user is passed
-                if exam_last.exam.passing_score > sum_score:
-                    exam_last.is_passed = False
-                else:
-                    exam_last.is_passed = True
-
-                    # check is last section and create next section
-                    if exam_last.exam.section.is_last_section is False:
-                        self._create_next_section(request.user.id, exam_last.exam.section_id, exam_last.exam.section.course_id)
-
-                # save item
-                exam_last.status = "done"
-                exam_last.submitted_at = timezone.now()
-                exam_last.obtained_score = sum_score
-                exam_last.save()
-
-                return response(
-                    error=False,
-                    status_code=200,
-                    data={"exam_last_id": exam_last.id},
-                    message="پردازش با موفقیت انجام شد",
-                    status=True
+
+            # obtained_score is kept up to date while answering, answers being saved hold the row lock
+            # and are counted before this read
+            is_passed = exam_last.obtained_score >= exam_last.exam.passing_score
+
+            # close the attempt, only once when the same request is sent twice
+            updated = StudentExamAttempt.objects.filter(
+                id=exam_last.id,
+                status="in_progress"
+            ).update(
+                status="done",
+                submitted_at=timezone.now(),
+                is_passed=is_passed
+            )
+            if not updated:
+                raise PermissionDenied("شما ازمون فعالی رو ندارید")
+
+            # check is last section and create next section
+            if is_passed and exam_last.exam.section.is_last_section is False:
+                self._create_next_section(
+                    request.user.id,
+                    exam_last.student_id,
+                    exam_last.exam.section_id,
+                    exam_last.exam.section.course_id
                 )
 
-    def _create_next_section(self, user_id, section_id, course_id):
+            return response(
+                error=False,
+                status_code=200,
+                data={"exam_last_id": exam_last.id},
+                message="پردازش با موفقیت انجام شد",
+                status=True
+            )
+
+    def _create_next_section(self, user_id, student_id, section_id, course_id):
         # get after section
         next_section = Section.objects.filter(
             id__gt=section_id,
@@ -444,11 +495,17 @@ class ExamDoneView(APIView):
             is_active=True,
         ).only("id").first()
         if next_section:
-            # get student
-            student = Student.objects.filter(user_id=user_id).only("id").first()
-            # create student access section
-            StudentAccessSection.objects.create(
-                student_id=student.id,
-                section_id=next_section.id,
-                is_access=True
+            # create student access section or open an existing one
+            StudentAccessSection.objects.bulk_create(
+                [
+                    StudentAccessSection(
+                        student_id=student_id,
+                        section_id=next_section.id,
+                        is_access=True
+                    )
+                ],
+                update_conflicts=True,
+                unique_fields=("student", "section"),
+                update_fields=("is_access", "updated_at"),
             )
+            section_access_cache.add(user_id, next_section.id)
@@ -6,7 +6,8 @@ from apis.v1.gateway.views import (
     VerifyPayment,
     ListRetrieveGatewayViewSet,
     ListRetrieveResultGateWayViewSet,
-    CheckSubscriptionView
+    CheckSubscriptionView,
+    PaymentStatusView
 )
 
 
@@ -22,5 +23,6 @@ gateway_router.register("result_gateway", ListRetrieveResultGateWayViewSet, base
 urlpatterns = [
     path('request_gateway/', GatewayView.as_view(), name='gateway'),
     path("verify_payment/", VerifyPayment.as_view(), name='verify_payment'),
-    path("check_active_plan/", CheckSubscriptionView.as_view(), name='check_active_plan')
+    path("check_active_plan/", CheckSubscriptionView.as_view(), name='check_active_plan'),
+    path("payment_status/<int:pk>/", PaymentStatusView.as_view(), name='payment_status')
 ] + router.urls + gateway_router.urls
@@ -6,19 +6,26 @@ from adrf.views import APIView
 from asgiref.sync import sync_to_async
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import mixins, viewsets, views
 from rest_framework.exceptions import NotFound, NotAcceptable, PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 
 from base.clasess.gateway import Gateway, bazaar
-from apps.discount_app.models import Coupon
+from base.utils.coupon_redemption import reserve_coupon, release_coupon, release_gateway_coupons
+from base.utils.entitlement_cache import has_active_subscription, invalidate_entitlements
+from base.utils.payment_reconciliation import record_failed_payment
+from base.utils.payment_status import publish_payment_status, wait_for_payment_status, PAID, \
+    PAYMENT_STATUS_MAX_WAIT
 from apps.gateway_app.models import Gateway as GatewayModel, ResultGateway
 from apps.subscription_app.models import SubscriptionPlan, UserSubscription
 from .serializer import GatewaySerializer, ListRetrieveGatewaySerializer, ListRetrieveResultGateWaySerializer
+from ...utils.custom_idempotency import idempotent, idempotency_key_header
 from ...utils.custom_exceptions import PlanAlreadyExistsException, TooManyRequests, PaymentTooManyRequests, \
     AmountTooManyRequests, CartdIsInvalid, SwitchError, CartNotFound, GatewayNotFound, InvalidIpGateway, \
     SubscriptionAlreadyExists
-from ...utils.custom_pagination import TwentyPageNumberPagination
+from ...utils.custom_pagination import TwentyPageNumberOrCursorPagination
 from ...utils.custom_permissions import AsyncIsAuthenticated
 from ...utils.custom_response import response
 
@@ -30,8 +37,10 @@ class GatewayView(APIView):
     """
     serializer_class = GatewaySerializer
     permission_classes = (AsyncIsAuthenticated,)
+    # gateway row of this request, it holds the reserved coupon use once created
+    gateway_record = None
 
-    async def _create_gateway_record(self, user_id, plan_id, result, gateway_name, is_complete: bool = False):
+    async def _create_gateway_record(self, user_id, plan_id, result, gateway_name, is_complete: bool = False, coupon=None):
         result_track_id = None
         checkout_token = None
         message_gateway = None
@@ -44,7 +53,7 @@ class GatewayView(APIView):
         elif gateway_name == "bazaar":
             checkout_token = result['checkout_token']
 
-        await GatewayModel.objects.acreate(
+        self.gateway_record = await GatewayModel.objects.acreate(
             user_id=user_id,
             subscription_id=plan_id,
             track_id=result_track_id,
@@ -53,6 +62,7 @@ class GatewayView(APIView):
             is_complete=is_complete,
             gateway_name=gateway_name,
             checkout_token=checkout_token,
+            coupon_id=coupon.id if coupon else None,
         )
 
     async def check_plan(self, plan_id):
@@ -78,17 +88,11 @@ class GatewayView(APIView):
             calc_discount = price *  coupon.amount / 100
             price -= calc_discount
 
-        return min(price, 0)
+        return max(price, 0)
 
     async def check_active_plan(self, plan, user_id):
         """check user dose have active plan"""
-        user_plan = await UserSubscription.objects.filter(
-            is_active=True,
-            user_id=user_id,
-        ).only(
-            "id", "status"
-        ).alast()
-        if user_plan and user_plan.status == "active":
+        if await sync_to_async(has_active_subscription)(user_id):
             raise PlanAlreadyExistsException()
 
     async def _create_user_plan(self, user_id, plan_id, duration, transaction_id):
@@ -104,17 +108,19 @@ class GatewayView(APIView):
         )
 
     async def _check_have_plan(self, plan_id, user_id):
-        plan = await UserSubscription.objects.filter(
-            id=plan_id,
-            user_id=user_id,
-            is_active=True,
-            start_date__lte=timezone.now(),
-            end_date__gte=timezone.now(),
-            status="active"
-        ).aexists()
-        if plan:
+        if await sync_to_async(has_active_subscription)(user_id, plan_id):
             raise PermissionDenied("شما از قبل پلن فعالی رو دارید")
 
+    async def _release_coupon(self, coupon):
+        # the payment was not started, the reserved use goes back
+        if not coupon:
+            return
+        if self.gateway_record is not None and not self.gateway_record.is_complete:
+            # clears gateway.coupon too, reconciliation does not give the same use back again
+            await sync_to_async(release_gateway_coupons)(self.gateway_record.id)
+        else:
+            await sync_to_async(release_coupon)(coupon.id)
+
     def handler_error(self, result):
         match result:
             case 115:
@@ -122,6 +128,8 @@ class GatewayView(APIView):
             case _:
                 raise NotAcceptable(detail=result)
 
+    @extend_schema(parameters=[idempotency_key_header])
+    @idempotent
     async def post(self, request):
         # import ipdb; ipdb.set_trace()
         serializer = self.serializer_class(data=request.data)
@@ -152,16 +160,25 @@ class GatewayView(APIView):
         # check active plan
         await self.check_active_plan(plan, user_id)
 
-        # get price
-        price = plan.discounted_price
-
-        # check coupon
+        # reserve one use of the coupon
+        coupon = None
         if coupon_code:
-            coupon = await Coupon.objects.filter(code=coupon_code, is_active=True).alast()
-            if not coupon.is_valid():
+            coupon = await sync_to_async(reserve_coupon)(coupon_code)
+            if coupon is None:
                 raise NotFound("coupon not found")
-            else:
-                price = await self.calc_price_by_coupon(price, coupon)
+
+        try:
+            return await self._start_payment(user_id, phone, plan, coupon, gateway_name, description)
+        except Exception:
+            # any failure after the reservation gives the use back
+            await self._release_coupon(coupon)
+            raise
+
+    async def _start_payment(self, user_id, phone, plan, coupon, gateway_name, description):
+        # get price
+        price = plan.discounted_price
+        if coupon:
+            price = await self.calc_price_by_coupon(price, coupon)
 
         # check price is zero
         if price == 0:
@@ -170,7 +187,7 @@ class GatewayView(APIView):
                 "message": "پرداخت با موفقیت انجام شد",
                 "result": 100
             }
-            await self._create_gateway_record(user_id, plan.id, result, gateway_name=None, is_complete=True)
+            await self._create_gateway_record(user_id, plan.id, result, gateway_name=None, is_complete=True, coupon=coupon)
             await UserSubscription.objects.acreate(
                 user_id=user_id,
                 plan_id=plan.id,
@@ -194,7 +211,7 @@ class GatewayView(APIView):
             result = await gate_way.request_payment(
                 amount=price,
                 description=description,
-                order_id=plain_id,
+                order_id=plan.id,
                 mobile=phone,
             )
 
@@ -203,7 +220,7 @@ class GatewayView(APIView):
                 self.handler_error(result)
 
             # create gateway record
-            await self._create_gateway_record(user_id, plan.id, result, gateway_name=gateway_name)
+            await self._create_gateway_record(user_id, plan.id, result, gateway_name=gateway_name, coupon=coupon)
 
             # create user plan
             transaction_id = f'{int(time.time())}_{uuid4().time}'
@@ -229,7 +246,9 @@ class GatewayView(APIView):
             )
 
             # create gateway record
-            await self._create_gateway_record(user_id=user_id, plan_id=plan.id, result=result_bazaar_gateway, gateway_name=gateway_name)
+            await self._create_gateway_record(
+                user_id=user_id, plan_id=plan.id, result=result_bazaar_gateway, gateway_name=gateway_name, coupon=coupon
+            )
 
             # create user plan
             transaction_id = f'{int(time.time())}_{uuid4().time}'
@@ -245,11 +264,13 @@ class GatewayView(APIView):
 
 class ListRetrieveGatewayViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     """
-    pagination --> 20 item
+    pagination --> 20 item \n
+    cursor pagination --> ?cursor= or ?pagination=cursor
     """
     permission_classes = (IsAuthenticated,)
     serializer_class = ListRetrieveGatewaySerializer
-    pagination_class = TwentyPageNumberPagination
+    pagination_class = TwentyPageNumberOrCursorPagination
+    cursor_ordering = "id"
 
     def get_queryset(self):
         fields = ("subscription__name", "is_complete", "created_at", "updated_at")
@@ -297,17 +318,25 @@ class VerifyPayment(APIView):
 
         # verify payment on zibal gateway
         gateway = Gateway()
-        verify_payment = await gateway.verify_payment(check_track_id)
+        verify_payment = await gateway.verify_payment(check_track_id.track_id)
 
         # check verify payment
         status_verify_payment = verify_payment.get('status', None)
         # result_verify_payment = verify_payment.get('result', None)
 
+        # canceled or rejected by the bank (3 and up), the reserved coupon use goes back
+        if isinstance(status_verify_payment, int) and status_verify_payment >= 3:
+            await sync_to_async(record_failed_payment)(check_track_id, verify_payment, order_id)
+
         match status_verify_payment:
             case 1:
                     # update status
                     await user_plan.aupdate(status="active")
-                    await check_track_id.asave(is_complete=True)
+                    # the reserved coupon use is kept from now on
+                    check_track_id.is_complete = True
+                    await check_track_id.asave(update_fields=("is_complete", "updated_at"))
+                    await sync_to_async(invalidate_entitlements)(user_id)
+                    await sync_to_async(publish_payment_status)(PAID, check_track_id.id)
 
                     # data
                     data = {
@@ -374,6 +403,33 @@ class VerifyPayment(APIView):
                 raise NotAcceptable()
 
 
+class PaymentStatusView(APIView):
+    """
+    long poll, answers as soon as the payment is paid or failed \n
+    status --> (paid, failed, pending), pending after ?timeout= seconds (max 55), ask again
+    """
+    permission_classes = (AsyncIsAuthenticated,)
+
+    @extend_schema(parameters=[OpenApiParameter("timeout", float)], responses=OpenApiTypes.OBJECT)
+    async def get(self, request, pk, *args, **kwargs):
+        try:
+            timeout = float(request.query_params.get("timeout", PAYMENT_STATUS_MAX_WAIT))
+        except ValueError:
+            raise NotAcceptable("timeout must be a number")
+
+        if not await GatewayModel.objects.filter(id=pk, user_id=request.user.id, is_active=True).aexists():
+            raise NotFound("gateway not found")
+
+        status = await wait_for_payment_status(pk, max(timeout, 0))
+        return response(
+            status_code=200,
+            status=True,
+            error=False,
+            data={"gateway_id": pk, "status": status},
+            message="وضعیت پرداخت"
+        )
+
+
 class ListRetrieveResultGateWayViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = ListRetrieveResultGateWaySerializer
     permission_classes = (IsAuthenticated,)
@@ -396,8 +452,7 @@ class CheckSubscriptionView(views.APIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, *args, **kwargs):
-        user_sub = UserSubscription.objects.filter(user_id=request.user.id).only("id").active_plan()
-        if user_sub:
+        if has_active_subscription(request.user.id):
             raise SubscriptionAlreadyExists()
         else:
             return response(
@@ -1,23 +1,33 @@
 import datetime
 import time
 
+from drf_spectacular.utils import extend_schema
 from rest_framework import mixins, viewsets, generics, views
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 
 from apps.subscription_app.models import SubscriptionPlan, InstallmentPlan, UserSubscription
+from base.utils.entitlement_cache import has_active_subscription
 from .serializers import (
     SubscriptionSerializer,
     InstallmentPlanSerializer,
     UserSubscriptionSerializer,
     BazarPaySubscriptionSerializer
 )
+from ...utils.custom_cache import CatalogListCacheMixin, CatalogListRetrieveCacheMixin
+from ...utils.custom_idempotency import idempotent, idempotency_key_header
 from ...utils.custom_pagination import TwentyPageNumberPagination
 from ...utils.custom_response import response
 
 
-class ListSubscriptionView(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+class ListSubscriptionView(
+    CatalogListRetrieveCacheMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet
+):
     serializer_class = SubscriptionSerializer
+    cache_tags = ("subscription_plan", "photo")
     # permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -37,8 +47,9 @@ class ListSubscriptionView(mixins.ListModelMixin, mixins.RetrieveModelMixin, vie
         )
 
 
-class InstallmentPlanViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+class InstallmentPlanViewSet(CatalogListCacheMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = InstallmentPlanSerializer
+    cache_tags = ("installment_plan",)
 
     def get_queryset(self):
         return InstallmentPlan.objects.filter(
@@ -67,6 +78,8 @@ class BazarPaymentView(views.APIView):
     serializer_class = BazarPaySubscriptionSerializer
     permission_classes = (IsAuthenticated,)
 
+    @extend_schema(parameters=[idempotency_key_header])
+    @idempotent
     def post(self, request, *args, **kwargs):
         serializer = BazarPaySubscriptionSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -75,11 +88,7 @@ class BazarPaymentView(views.APIView):
         plan_id = serializer.validated_data["plan"].id
 
         # check user have subscription
-        user_subscription = UserSubscription.objects.filter(
-            plan_id=plan_id,
-            user_id=request.user.id
-        ).active_plan().only("id")
-        if user_subscription:
+        if has_active_subscription(request.user.id, plan_id):
             return response(
                 status=False,
                 message="شما از قبل اشتراک فعال دارید",
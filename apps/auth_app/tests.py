@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django_redis import get_redis_connection
+
+from base.utils import otp_store
+from base.utils.otp_store import issue_otp, verify_otp, OTP_VERIFIED, OTP_INVALID, OTP_EXPIRED, OTP_MAX_ATTEMPTS
+
+
+class OtpStoreTests(SimpleTestCase):
+    phone = "09120000000"
+
+    def setUp(self):
+        self.key = otp_store.OTP_KEY.format(phone=self.phone)
+        get_redis_connection("default").delete(self.key)
+        self.addCleanup(get_redis_connection("default").delete, self.key)
+
+    def wrong_code(self, code):
+        return str((int(code) + 1) % 10 ** otp_store.OTP_LENGTH).zfill(otp_store.OTP_LENGTH)
+
+    def test_code_is_consumed(self):
+        code, _ = issue_otp(self.phone)
+        self.assertEqual(verify_otp(self.phone, code), OTP_VERIFIED)
+        self.assertEqual(verify_otp(self.phone, code), OTP_EXPIRED)
+
+    def test_code_is_not_stored(self):
+        code, _ = issue_otp(self.phone)
+        record = get_redis_connection("default").hgetall(self.key)
+        self.assertNotIn(code.encode(), record.values())
+
+    def test_wrong_code(self):
+        code, _ = issue_otp(self.phone)
+        self.assertEqual(verify_otp(self.phone, self.wrong_code(code)), OTP_INVALID)
+        self.assertEqual(verify_otp(self.phone, code), OTP_VERIFIED)
+
+    def test_attempts_are_limited(self):
+        code, _ = issue_otp(self.phone)
+        for _ in range(OTP_MAX_ATTEMPTS):
+            self.assertEqual(verify_otp(self.phone, self.wrong_code(code)), OTP_INVALID)
+        # the record is gone, the right code does not help anymore
+        self.assertEqual(verify_otp(self.phone, code), OTP_EXPIRED)
+
+    def test_new_code_replaces_the_previous_one(self):
+        old_code, _ = issue_otp(self.phone)
+        for _ in range(OTP_MAX_ATTEMPTS - 1):
+            verify_otp(self.phone, self.wrong_code(old_code))
+        code, _ = issue_otp(self.phone)
+        if old_code != code:
+            self.assertEqual(verify_otp(self.phone, old_code), OTP_INVALID)
+        self.assertEqual(verify_otp(self.phone, code), OTP_VERIFIED)
+
+    def test_expired_code(self):
+        code, expires_at = issue_otp(self.phone)
+        with mock.patch.object(otp_store.time, "time", return_value=expires_at):
+            self.assertEqual(verify_otp(self.phone, code), OTP_EXPIRED)
+
+    def test_missing_code(self):
+        self.assertEqual(verify_otp(self.phone, "123456"), OTP_EXPIRED)
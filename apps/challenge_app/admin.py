@@ -4,14 +4,15 @@ from django.utils.html import format_html
 from django.db.models import JSONField
 from django_json_widget.widgets import JSONEditorWidget
 
-from .models import Challenge, ChallengeSubmission, UserChallengeProgress, UserChallengeScore
+from base.utils.challenge_stats import recompute_statistics
+from .models import Challenge, ChallengeSubmission, UserChallengeProgress, UserChallengeScore, TestCase
 
 
-# class TestCaseInline(admin.TabularInline):
-#     model = TestCase
-#     extra = 1
-#     fields = ('input_data', 'expected_output', 'order')
-#     ordering = ('order',)
+class TestCaseInline(admin.TabularInline):
+    model = TestCase
+    extra = 1
+    fields = ('input_data', 'expected_output', 'order')
+    ordering = ('order',)
 
 
 class ChallengeSubmissionInline(admin.TabularInline):
@@ -55,6 +56,7 @@ class ChallengeAdmin(admin.ModelAdmin):
         'total_submissions',
         'successful_submissions',
         'avg_completion_time',
+        'timed_submissions',
         'created_at',
         'updated_at',
         'get_completion_rate'
@@ -89,6 +91,7 @@ class ChallengeAdmin(admin.ModelAdmin):
                 'total_submissions',
                 'successful_submissions',
                 'avg_completion_time',
+                'timed_submissions',
                 'get_completion_rate'
             )
         }),
@@ -107,7 +110,7 @@ class ChallengeAdmin(admin.ModelAdmin):
         }),
     )
 
-    # inlines = (TestCaseInline,)
+    inlines = (TestCaseInline,)
     raw_id_fields = ("image",)
     formfield_overrides = {
         JSONField: {'widget': JSONEditorWidget},
@@ -132,6 +135,7 @@ class ChallengeAdmin(admin.ModelAdmin):
             "answer",
             "memory_limit",
             "avg_completion_time",
+            "timed_submissions",
             "image__image",
             "image__height",
             "image__width",
@@ -156,64 +160,64 @@ class ChallengeAdmin(admin.ModelAdmin):
     #     return readonly_fields
 
 
-# @admin.register(TestCase)
-# class TestCaseAdmin(admin.ModelAdmin):
-#     list_display = (
-#         'challenge_id',
-#         "get_challenge_name",
-#         "id",
-#         'get_input_preview',
-#         'get_output_preview',
-#         'order',
-#         'created_at'
-#     )
-#     list_display_links = ("id", "challenge_id", "get_challenge_name")
-#     list_filter = ('challenge__language', 'challenge__level')
-#     search_fields = ('challenge__name',)
-#     search_help_text = _("برای جست و جو میتوانید از نام چالش استفاده کنید")
-#     list_editable = ('order',)
-#     list_per_page = 30
-#     list_max_show_all = 100
-#
-#     fieldsets = (
-#         (None, {
-#             'fields': (
-#                 'challenge',
-#                 'input_data',
-#                 'expected_output',
-#                 'order'
-#             )
-#         }),
-#         (_("تاریخ‌ها"), {
-#             'fields': (
-#                 'created_at',
-#                 'updated_at'
-#             )
-#         }),
-#     )
-#     readonly_fields = ("created_at", "updated_at")
-#     raw_id_fields = ("challenge",)
-#
-#     def get_queryset(self, request):
-#         fields = ("input_data", "expected_output", "order", "is_active", "created_at", "updated_at", "challenge__name")
-#         return super().get_queryset(request).select_related('challenge').only(*fields)
-#
-#     def get_input_preview(self, obj):
-#         if len(obj.input_data) > 50:
-#             return f"{obj.input_data[:50]}..."
-#         return obj.input_data
-#
-#     get_input_preview.short_description = _("ورودی")
-#
-#     def get_output_preview(self, obj):
-#         if len(obj.expected_output) > 50:
-#             return f"{obj.expected_output[:50]}..."
-#         return obj.expected_output
-#
-#     get_output_preview.short_description = _("خروجی مورد انتظار")
-#
-#     def get_challenge_name(self, obj):
-#         return obj.challenge.name
+@admin.register(TestCase)
+class TestCaseAdmin(admin.ModelAdmin):
+    list_display = (
+        'challenge_id',
+        "get_challenge_name",
+        "id",
+        'get_input_preview',
+        'get_output_preview',
+        'order',
+        'created_at'
+    )
+    list_display_links = ("id", "challenge_id", "get_challenge_name")
+    list_filter = ('challenge__language', 'challenge__level')
+    search_fields = ('challenge__name',)
+    search_help_text = _("برای جست و جو میتوانید از نام چالش استفاده کنید")
+    list_editable = ('order',)
+    list_per_page = 30
+    list_max_show_all = 100
+
+    fieldsets = (
+        (None, {
+            'fields': (
+                'challenge',
+                'input_data',
+                'expected_output',
+                'order'
+            )
+        }),
+        (_("تاریخ‌ها"), {
+            'fields': (
+                'created_at',
+                'updated_at'
+            )
+        }),
+    )
+    readonly_fields = ("created_at", "updated_at")
+    raw_id_fields = ("challenge",)
+
+    def get_queryset(self, request):
+        fields = ("input_data", "expected_output", "order", "is_active", "created_at", "updated_at", "challenge__name")
+        return super().get_queryset(request).select_related('challenge').only(*fields)
+
+    def get_input_preview(self, obj):
+        if len(obj.input_data) > 50:
+            return f"{obj.input_data[:50]}..."
+        return obj.input_data
+
+    get_input_preview.short_description = _("ورودی")
+
+    def get_output_preview(self, obj):
+        if len(obj.expected_output) > 50:
+            return f"{obj.expected_output[:50]}..."
+        return obj.expected_output
+
+    get_output_preview.short_description = _("خروجی مورد انتظار")
+
+    def get_challenge_name(self, obj):
+        return obj.challenge.name
 
 
 @admin.register(ChallengeSubmission)
@@ -225,7 +229,7 @@ class ChallengeSubmissionAdmin(admin.ModelAdmin):
         'get_challenge_name',
         # 'language',
         'status',
-        # 'execution_time',
+        'execution_time',
         'score',
         'created_at'
     )
@@ -246,7 +250,8 @@ class ChallengeSubmissionAdmin(admin.ModelAdmin):
         # 'challenge',
         # 'code',
         # 'language',
-        # 'test_results',
+        'execution_time',
+        'test_results',
         'created_at',
         'updated_at',
         'get_status_color'
@@ -260,23 +265,23 @@ class ChallengeSubmissionAdmin(admin.ModelAdmin):
                 'user',
                 'challenge',
                 # 'language',
-                # 'code'
+                'source_code'
             )
         }),
         (_("نتایج اجرا"), {
             'fields': (
                 'status',
                 'get_status_color',
-                # 'execution_time',
+                'execution_time',
                 # 'memory_used',
                 'score'
             )
         }),
-        # (_("نتایج تست‌ها"), {
-        #     'fields': (
-        #         'test_results',
-        #     )
-        # }),
+        (_("نتایج تست‌ها"), {
+            'fields': (
+                'test_results',
+            )
+        }),
         (_("تاریخ‌ها"), {
             'fields': (
                 'created_at',
@@ -296,11 +301,12 @@ class ChallengeSubmissionAdmin(admin.ModelAdmin):
             "challenge__language",
             # "language",
             "status",
-            # "test_results",
+            "test_results",
+            "source_code",
             "created_at",
             "updated_at",
             "is_active",
-            # "execution_time",
+            "execution_time",
             # "memory_used",
             "score",
         )
@@ -452,8 +458,8 @@ make_draft.short_description = _("پیش‌نویس کردن چالش‌های 
 
 
 def recalculate_statistics(modeladmin, request, queryset):
-    for challenge in queryset:
-        challenge.update_statistics()
+    count = recompute_statistics(list(queryset.values_list("id", flat=True)))
+    modeladmin.message_user(request, _("آمار {} چالش محاسبه شد").format(count))
 
 
 recalculate_statistics.short_description = _("محاسبه مجدد آمار چالش‌ها")
@@ -0,0 +1,111 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apis.v1.challenge.views import SubmitChallengeView
+from apps.auth_app.models import User
+from apps.challenge_app.models import Challenge, ChallengeSubmission, UserChallengeScore, UserChallengeProgress
+from apps.challenge_app.tasks import flush_challenge_statistics
+from base.utils.challenge_stats import recompute_statistics
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends concurrent submissions for one challenge and checks the counters afterwards. "
+        "Writes to the database, the written rows are removed at the end unless --keep is given"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--challenge", type=int, required=True, help="challenge id")
+        parser.add_argument("--users", type=int, default=200, help="number of users, one submission each")
+        parser.add_argument("--threads", type=int, default=20)
+        parser.add_argument("--status", default="accepted", choices=[choice[0] for choice in ChallengeSubmission.STATUS_CHOICES])
+        parser.add_argument("--keep", action="store_true", help="keep the submissions and the counters")
+
+    def _submit(self, user, challenge_id, status):
+        factory = APIRequestFactory()
+        view = SubmitChallengeView.as_view()
+        request = factory.post(f"/v1/api/challenge/list/{challenge_id}/submit/", {"status": status}, format="json")
+        force_authenticate(request, user=user)
+        try:
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = view(request, pk=challenge_id)
+                elapsed = (time.perf_counter() - start) * 1000
+            return response.status_code, elapsed, len(context.captured_queries)
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        challenge_id = options["challenge"]
+        status = options["status"]
+
+        # counters of earlier submissions are not part of the benchmark
+        flush_challenge_statistics()
+        challenge = Challenge.objects.filter(id=challenge_id, is_active=True).only(
+            "total_submissions", "successful_submissions"
+        ).first()
+        if not challenge:
+            raise CommandError(f"challenge {challenge_id} not found")
+
+        users = list(
+            User.objects.exclude(
+                challenge_submissions__challenge_id=challenge_id
+            ).only("id").order_by("id")[:options["users"]]
+        )
+        if not users:
+            raise CommandError("no user without a submission for this challenge")
+
+        user_ids = [user.id for user in users]
+        scores_before = dict(
+            UserChallengeScore.objects.filter(user_id__in=user_ids).values_list("user_id", "total_score")
+        )
+        last_submission_id = ChallengeSubmission.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            results = list(executor.map(lambda user: self._submit(user, challenge_id, status), users))
+        wall = time.perf_counter() - start
+
+        timings = sorted(result[1] for result in results)
+        created = sum(1 for result in results if result[0] == 201)
+        self.stdout.write(f"{len(results)} submissions, {options['threads']} threads, {wall:.2f} s, {len(results) / wall:.1f} req/s")
+        self.stdout.write(
+            f"latency p50 {statistics.median(timings):.2f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms, max {timings[-1]:.2f} ms"
+        )
+        self.stdout.write(f"queries per submission: {max(result[2] for result in results)}")
+        self.stdout.write(f"status codes: {sorted({result[0] for result in results})}, created {created}")
+
+        # counters must match the rows that were written
+        flush_challenge_statistics()
+        challenge_after = Challenge.objects.only("total_submissions", "successful_submissions").get(id=challenge_id)
+        total_change = challenge_after.total_submissions - challenge.total_submissions
+        successful_change = challenge_after.successful_submissions - challenge.successful_submissions
+        expected_successful = created if status == "accepted" else 0
+        if total_change == created and successful_change == expected_successful:
+            self.stdout.write(self.style.SUCCESS(f"challenge counters are consistent (+{total_change})"))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"challenge counters drifted: total +{total_change}, successful +{successful_change}, created {created}"
+            ))
+
+        if not options["keep"]:
+            with transaction.atomic():
+                # the users had no submission for this challenge before the benchmark
+                UserChallengeProgress.objects.filter(challenge_id=challenge_id, user_id__in=user_ids).delete()
+                ChallengeSubmission.objects.filter(
+                    id__gt=last_submission_id, challenge_id=challenge_id, user_id__in=user_ids
+                ).delete()
+                recompute_statistics([challenge_id])
+                for user_id, total_score in scores_before.items():
+                    UserChallengeScore.objects.filter(user_id=user_id).update(total_score=total_score)
+                UserChallengeScore.objects.filter(user_id__in=user_ids).exclude(user_id__in=scores_before).delete()
+            self.stdout.write("benchmark rows removed")
+
+        self.stdout.write(self.style.SUCCESS("Successfully finished challenge submit benchmark"))
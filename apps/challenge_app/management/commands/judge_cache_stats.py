@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand
+
+from base.utils.judge_cache import get_judge_cache_stats, reset_judge_cache_stats, JUDGE_RESULT_MAX_ENTRIES
+
+
+class Command(BaseCommand):
+    help = "Shows hits, misses and size of the judge result cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="reset hit and miss counters")
+
+    def handle(self, *args, **options):
+        stats = get_judge_cache_stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups * 100 if lookups else 0
+
+        self.stdout.write(f"hits: {stats['hits']}, misses: {stats['misses']}, hit rate: {hit_rate:.1f}%")
+        self.stdout.write(f"entries: {stats['size']} / {JUDGE_RESULT_MAX_ENTRIES}")
+
+        if options["reset"]:
+            reset_judge_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Successfully reset judge cache counters"))
@@ -0,0 +1,54 @@
+from base.clasess.batch_command import KeysetBatchCommand
+from apps.challenge_app.models import ChallengeSubmission, UserChallengeProgress
+from base.utils.challenge_submission import UNFINISHED_STATUSES
+
+
+class Command(KeysetBatchCommand):
+    help = (
+        "Rebuilds user_challenge_progress from challenge_submission, one grouped query per batch of users. "
+        "Existing rows of a batch are overwritten. Safe to stop and re-run, it resumes from the last finished batch."
+    )
+    table = ChallengeSubmission._meta.db_table
+    key_column = "user_id"
+    checkpoint_key = "rebuild_challenge_progress:last_user_id"
+    key_name = "user"
+
+    def process_batch(self, cursor, lower, upper, options):
+        progress_table = UserChallengeProgress._meta.db_table
+        cursor.execute(
+            f"""
+            INSERT INTO {progress_table}
+                (user_id, challenge_id, is_completed, best_score, attempts_count, completed_at,
+                 best_submission_id, is_active, created_at, updated_at)
+            SELECT
+                user_id,
+                challenge_id,
+                BOOL_OR(status = 'accepted'),
+                MAX(score),
+                COUNT(*),
+                MIN(created_at) FILTER (WHERE status = 'accepted'),
+                (ARRAY_AGG(id ORDER BY score DESC, id))[1],
+                TRUE,
+                MIN(created_at),
+                NOW()
+            FROM {self.table}
+            WHERE user_id > %s AND user_id <= %s AND is_active AND status <> ALL(%s)
+            GROUP BY user_id, challenge_id
+            ON CONFLICT (user_id, challenge_id) DO UPDATE SET
+                is_completed = EXCLUDED.is_completed,
+                best_score = EXCLUDED.best_score,
+                attempts_count = EXCLUDED.attempts_count,
+                completed_at = EXCLUDED.completed_at,
+                best_submission_id = EXCLUDED.best_submission_id,
+                updated_at = EXCLUDED.updated_at
+            """,
+            [lower, upper, list(UNFINISHED_STATUSES)],
+        )
+        return cursor.rowcount
+
+    def describe_batch(self, count):
+        return f"{count} progress rows"
+
+    def handle(self, *args, **options):
+        total_rows = self.run_batches(options)
+        self.stdout.write(self.style.SUCCESS(f"Successfully rebuilt {total_rows} user_challenge_progress rows"))
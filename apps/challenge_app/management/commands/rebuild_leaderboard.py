@@ -0,0 +1,80 @@
+from collections import defaultdict
+
+from django.core.management import BaseCommand
+from django_redis import get_redis_connection
+
+from apps.challenge_app.models import UserChallengeScore
+from base.utils.leaderboard import LEADERBOARD_KEY, LEADERBOARD_MEMBERSHIP_KEY, user_boards
+
+REBUILD_PREFIX = "leaderboard_rebuild:"
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the leaderboard sorted sets from user_score in streamed chunks and swaps them in with RENAME. "
+        "Score changes made while it runs can be overwritten, run it when traffic is low"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        redis = get_redis_connection("default")
+        chunk_size = options["chunk_size"]
+
+        # leftovers of a failed run
+        for key in redis.scan_iter(f"{REBUILD_PREFIX}*"):
+            redis.delete(key)
+
+        scores = UserChallengeScore.objects.filter(
+            user__is_active=True
+        ).values_list(
+            "user_id", "total_score", "user__state_id", "user__city_id", "user__school"
+        ).order_by("user_id").iterator(chunk_size=chunk_size)
+
+        boards = set()
+        count = 0
+        chunk = []
+        for row in scores:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                boards |= self._write_chunk(redis, chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            boards |= self._write_chunk(redis, chunk)
+            count += len(chunk)
+
+        # swap all boards at once, boards without users any more are dropped
+        live_keys = {key.decode() for key in redis.scan_iter(LEADERBOARD_KEY.format(board="*"))}
+        live_keys.discard(LEADERBOARD_MEMBERSHIP_KEY)
+        new_keys = {LEADERBOARD_KEY.format(board=board) for board in boards}
+
+        pipe = redis.pipeline(transaction=True)
+        for key in new_keys:
+            pipe.rename(f"{REBUILD_PREFIX}{key}", key)
+        for key in live_keys - new_keys:
+            pipe.delete(key)
+        if count:
+            pipe.rename(f"{REBUILD_PREFIX}{LEADERBOARD_MEMBERSHIP_KEY}", LEADERBOARD_MEMBERSHIP_KEY)
+        else:
+            pipe.delete(LEADERBOARD_MEMBERSHIP_KEY)
+        pipe.execute()
+
+        self.stdout.write(self.style.SUCCESS(f"Successfully rebuilt {len(new_keys)} leaderboards for {count} users"))
+
+    def _write_chunk(self, redis, chunk):
+        members = defaultdict(dict)
+        membership = {}
+        for user_id, total_score, state_id, city_id, school in chunk:
+            boards = user_boards(state_id, city_id, school)
+            for board in boards:
+                members[board][user_id] = total_score
+            membership[user_id] = "|".join(boards)
+
+        pipe = redis.pipeline(transaction=False)
+        for board, board_members in members.items():
+            pipe.zadd(f"{REBUILD_PREFIX}{LEADERBOARD_KEY.format(board=board)}", board_members)
+        pipe.hset(f"{REBUILD_PREFIX}{LEADERBOARD_MEMBERSHIP_KEY}", mapping=membership)
+        pipe.execute()
+        return set(members)
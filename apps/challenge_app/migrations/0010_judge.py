@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenge_app', '0009_challenge_answer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challengesubmission',
+            name='execution_time',
+            field=models.IntegerField(blank=True, null=True, verbose_name='زمان اجرا (میلی\u200cثانیه)'),
+        ),
+        migrations.AddField(
+            model_name='challengesubmission',
+            name='source_code',
+            field=models.TextField(blank=True, null=True, verbose_name='کد ارسالی'),
+        ),
+        migrations.AddField(
+            model_name='challengesubmission',
+            name='test_results',
+            field=models.JSONField(blank=True, default=list, verbose_name='نتایج تست\u200cها'),
+        ),
+        migrations.CreateModel(
+            name='TestCase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('input_data', models.TextField(blank=True, verbose_name='ورودی')),
+                ('expected_output', models.TextField(verbose_name='خروجی مورد انتظار')),
+                ('order', models.IntegerField(default=0, verbose_name='ترتیب')),
+                ('challenge', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='test_cases', to='challenge_app.challenge', verbose_name='چالش')),
+            ],
+            options={
+                'verbose_name': 'تست\u200cکیس',
+                'verbose_name_plural': 'تست\u200cکیس\u200cها',
+                'db_table': 'test_case',
+                'ordering': ('order', 'id'),
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenge_app', '0010_judge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='timed_submissions',
+            field=models.IntegerField(default=0, verbose_name='تعداد ارسال\u200cهای زمان\u200cدار'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenge_app', '0011_challenge_timed_submissions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='challengesubmission',
+            name='status',
+            field=models.CharField(choices=[('pending', 'در انتظار'), ('running', 'در حال اجرا'), ('accepted', 'پذیرفته شده'), ('wrong_answer', 'پاسخ اشتباه'), ('time_limit_exceeded', 'محدودیت زمان'), ('memory_limit_exceeded', 'محدودیت حافظه'), ('runtime_error', 'خطای زمان اجرا'), ('compilation_error', 'خطای کامپایل'), ('solved', 'حل شده'), ('judge_error', 'خطای داوری')], default='pending', max_length=30, verbose_name='وضعیت'),
+        ),
+    ]
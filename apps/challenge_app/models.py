@@ -40,6 +40,8 @@ class Challenge(CreateMixin, UpdateMixin, ActiveMixin):
     total_submissions = models.IntegerField(_("تعداد کل ارسال‌ها"), default=0)
     successful_submissions = models.IntegerField(_("تعداد ارسال‌های موفق"), default=0)
     avg_completion_time = models.FloatField(_("میانگین زمان حل (ثانیه)"), default=0)
+    # accepted submissions with an execution time, weight of avg_completion_time
+    timed_submissions = models.IntegerField(_("تعداد ارسال‌های زمان‌دار"), default=0)
 
     # محدودیت‌ها
     time_limit = models.IntegerField(_("محدودیت زمان (میلی‌ثانیه)"), default=2000)
@@ -68,6 +70,25 @@ class Challenge(CreateMixin, UpdateMixin, ActiveMixin):
         verbose_name_plural = _("چالش‌ها")
 
 
+class TestCase(CreateMixin, UpdateMixin, ActiveMixin):
+    """تست‌کیس های داوری چالش"""
+    challenge = models.ForeignKey(
+        Challenge,
+        on_delete=models.PROTECT,
+        related_name='test_cases',
+        verbose_name=_("چالش")
+    )
+    input_data = models.TextField(_("ورودی"), blank=True)
+    expected_output = models.TextField(_("خروجی مورد انتظار"))
+    order = models.IntegerField(_("ترتیب"), default=0)
+
+    class Meta:
+        db_table = "test_case"
+        ordering = ("order", "id")
+        verbose_name = _("تست‌کیس")
+        verbose_name_plural = _("تست‌کیس‌ها")
+
+
 class ChallengeSubmission(CreateMixin, UpdateMixin, ActiveMixin):
     """مدل برای ذخیره ارسال‌های کاربران"""
 
@@ -80,7 +101,8 @@ class ChallengeSubmission(CreateMixin, UpdateMixin, ActiveMixin):
         ('memory_limit_exceeded', _("محدودیت حافظه")),
         ('runtime_error', _("خطای زمان اجرا")),
         ('compilation_error', _("خطای کامپایل")),
-        ("solved", _("حل شده"))
+        ("solved", _("حل شده")),
+        ("judge_error", _("خطای داوری"))
     )
 
     user = models.ForeignKey(
@@ -96,6 +118,7 @@ class ChallengeSubmission(CreateMixin, UpdateMixin, ActiveMixin):
         verbose_name=_("چالش")
     )
     # code = models.FileField(_("کد ارسالی"))
+    source_code = models.TextField(_("کد ارسالی"), blank=True, null=True)
     # language = models.CharField(_("زبان برنامه‌نویسی"), max_length=50)
     status = models.CharField(
         _("وضعیت"),
@@ -103,12 +126,12 @@ class ChallengeSubmission(CreateMixin, UpdateMixin, ActiveMixin):
         choices=STATUS_CHOICES,
         default='pending'
     )
-    # execution_time = models.IntegerField(_("زمان اجرا (میلی‌ثانیه)"), null=True, blank=True)
+    execution_time = models.IntegerField(_("زمان اجرا (میلی‌ثانیه)"), null=True, blank=True)
     # memory_used = models.IntegerField(_("حافظه استفاده شده (کیلوبایت)"), null=True, blank=True)
     score = models.FloatField(_("امتیاز"), default=0)
 
     # نتیجه تست‌کیس‌ها (ذخیره به صورت JSON)
-    # test_results = models.JSONField(_("نتایج تست‌ها"), default=dict, blank=True)
+    test_results = models.JSONField(_("نتایج تست‌ها"), default=list, blank=True)
 
     class Meta:
         db_table = "challenge_submission"
@@ -0,0 +1,53 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apis.utils.custom_cache import bump_catalog_tags
+from apps.auth_app.models import User
+from base.utils import leaderboard
+from base.utils.judge_cache import JUDGE_TEST_SET_TAG
+from base.utils.solved_challenge_cache import solved_challenge_cache
+from .models import Challenge, ChallengeSubmission, TestCase, UserChallengeScore
+
+LEADERBOARD_USER_FIELDS = {"state", "state_id", "city", "city_id", "school"}
+
+
+@receiver(post_save, sender=UserChallengeScore)
+def refresh_leaderboard_score(sender, instance, **kwargs):
+    # admin edits, submissions mirror their F() updates themselves
+    leaderboard.set_user_score(instance.user, instance.total_score)
+
+
+@receiver(post_delete, sender=UserChallengeScore)
+def remove_leaderboard_score(sender, instance, **kwargs):
+    leaderboard.remove_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def refresh_leaderboard_boards(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    # last_login and other partial saves do not move the user
+    if update_fields is not None and not LEADERBOARD_USER_FIELDS & set(update_fields):
+        return
+    leaderboard.move_user_boards(instance)
+
+
+@receiver(post_save, sender=TestCase)
+@receiver(post_delete, sender=TestCase)
+def refresh_test_case_judge_cache(sender, instance, **kwargs):
+    bump_catalog_tags(JUDGE_TEST_SET_TAG.format(challenge_id=instance.challenge_id))
+
+
+@receiver(post_save, sender=Challenge)
+def refresh_challenge_judge_cache(sender, instance, created, **kwargs):
+    # time and memory limits change the result too
+    if not created:
+        bump_catalog_tags(JUDGE_TEST_SET_TAG.format(challenge_id=instance.id))
+
+
+@receiver(post_save, sender=ChallengeSubmission)
+@receiver(post_delete, sender=ChallengeSubmission)
+def refresh_solved_challenge_cache(sender, instance, created=False, **kwargs):
+    # new submissions are added by record_submission_result, edits and deletes reload the set
+    if not created:
+        solved_challenge_cache.invalidate(instance.user_id)
@@ -0,0 +1,84 @@
+from dataclasses import asdict
+
+from celery import shared_task
+from django.db import transaction
+from django.utils import timezone
+
+from base.clasess.judge import PythonJudge
+from base.utils.challenge_submission import lock_user_score, has_finished_submission, record_submission_result, \
+    upsert_challenge_progress, fail_stale_judge_submissions, JUDGE_ERROR_STATUS
+from base.utils.challenge_stats import flush_counters, CHALLENGE_STATS_FLUSH_BATCH
+from base.utils.judge_cache import judge_result_key, set_judge_result
+from .models import ChallengeSubmission, TestCase
+
+
+@shared_task(acks_late=True, time_limit=600)
+def judge_submission(submission_id):
+    # pending --> running, a redelivered task does not judge the same submission twice
+    if not ChallengeSubmission.objects.filter(id=submission_id, status="pending").update(
+        status="running", updated_at=timezone.now()
+    ):
+        return
+
+    try:
+        _judge(submission_id)
+    except Exception:
+        # a running submission blocks the user on the challenge, it has to end in a final status
+        ChallengeSubmission.objects.filter(id=submission_id, status="running").update(
+            status=JUDGE_ERROR_STATUS, updated_at=timezone.now()
+        )
+        raise
+
+
+def _judge(submission_id):
+    submission = ChallengeSubmission.objects.select_related("challenge", "user").only(
+        "user_id",
+        "source_code",
+        "challenge__points",
+        "challenge__language",
+        "challenge__time_limit",
+        "challenge__memory_limit",
+        "user__state_id",
+        "user__city_id",
+        "user__school",
+    ).get(id=submission_id)
+    challenge = submission.challenge
+    # version of the test set that is about to be loaded
+    cache_key = judge_result_key(challenge, submission.source_code)
+
+    test_cases = list(
+        TestCase.objects.filter(
+            challenge_id=challenge.id, is_active=True
+        ).order_by("order", "id").values_list("input_data", "expected_output")
+    )
+    result = PythonJudge(challenge.time_limit, challenge.memory_limit).judge(submission.source_code, test_cases)
+    set_judge_result(cache_key, asdict(result))
+
+    with transaction.atomic():
+        user_score = lock_user_score(submission.user_id)
+        # points are given once per challenge
+        first_finish = not has_finished_submission(submission.user_id, challenge.id)
+
+        score = challenge.points if result.status == "accepted" and first_finish else 0
+        ChallengeSubmission.objects.filter(id=submission_id).update(
+            status=result.status,
+            score=score,
+            execution_time=result.execution_time,
+            test_results=result.test_results,
+        )
+        if first_finish:
+            record_submission_result(submission.user, challenge, user_score, result.status, result.execution_time)
+        upsert_challenge_progress(submission_id, submission.user_id, challenge.id, result.status, score)
+
+
+@shared_task
+def fail_stale_submissions():
+    # submissions whose judge task was lost or killed by the time_limit
+    return fail_stale_judge_submissions()
+
+
+@shared_task
+def flush_challenge_statistics():
+    # one UPDATE per batch of challenges, until the dirty set is empty
+    while flush_counters() == CHALLENGE_STATS_FLUSH_BATCH:
+        pass
@@ -1,3 +1,132 @@
-from django.test import TestCase
+import socket
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.auth_app.models import User
+from apps.challenge_app.models import (
+    Challenge, ChallengeSubmission, UserChallengeScore, UserChallengeProgress, TestCase as ChallengeTestCase
+)
+from base.clasess.judge import PythonJudge
+
+
+class PythonJudgeTests(SimpleTestCase):
+    def setUp(self):
+        self.judge = PythonJudge(time_limit=1000, memory_limit=64)
+
+    def test_accepted(self):
+        result = self.judge.judge("print(int(input()) * 2)", [("21", "42"), ("5", "10\n")])
+        self.assertEqual(result.status, "accepted")
+        self.assertEqual(len(result.test_results), 2)
+
+    def test_wrong_answer_stops_at_first_failed_test(self):
+        result = self.judge.judge("print(int(input()) + 1)", [("1", "2"), ("1", "3"), ("1", "2")])
+        self.assertEqual(result.status, "wrong_answer")
+        self.assertEqual(len(result.test_results), 2)
+
+    def test_time_limit_exceeded(self):
+        judge = PythonJudge(time_limit=200, memory_limit=64)
+        result = judge.judge("while True:\n    pass", [("", "")])
+        self.assertEqual(result.status, "time_limit_exceeded")
+
+    def test_memory_limit_exceeded(self):
+        result = self.judge.judge("data = bytearray(1024 * 1024 * 1024)", [("", "")])
+        self.assertEqual(result.status, "memory_limit_exceeded")
+
+    def test_compilation_error(self):
+        self.assertEqual(self.judge.judge("def f(:", [("", "")]).status, "compilation_error")
+        # nested too deep for the compiler
+        self.assertEqual(self.judge.judge("-" * 100000 + "1", [("", "")]).status, "compilation_error")
+
+    def test_runtime_error(self):
+        self.assertEqual(self.judge.judge("raise ValueError()", [("", "")]).status, "runtime_error")
+
+    def test_no_network(self):
+        # reachable from the test process, the submission has its own empty network namespace
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        self.addCleanup(server.close)
+        source = (
+            "import socket\n"
+            "try:\n"
+            f"    socket.create_connection(('127.0.0.1', {server.getsockname()[1]}), timeout=0.5)\n"
+            "    print('connected')\n"
+            "except OSError:\n"
+            "    print('blocked')\n"
+        )
+        self.assertEqual(self.judge.judge(source, [("", "blocked")]).status, "accepted")
+
+
+class SubmitChallengeTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(mobile_phone="09120000002")
+        self.client.force_authenticate(self.user)
+        self.challenge = Challenge.objects.create(
+            name="sum", description={}, answer={"code": "print(1)"}, language="JS", level="easy", points=10
+        )
+
+    def submit(self, challenge=None, **data):
+        challenge = challenge or self.challenge
+        return self.client.post(
+            reverse("v1_challenge:submit-challenge", kwargs={"pk": challenge.id}), data, format="json"
+        )
+
+    def total_score(self):
+        return UserChallengeScore.objects.get(user=self.user).total_score
+
+    def test_accepted_submission_updates_score_and_progress(self):
+        res = self.submit(status="accepted")
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(self.total_score(), 10)
+        progress = UserChallengeProgress.objects.get(user=self.user, challenge=self.challenge)
+        self.assertTrue(progress.is_completed)
+        self.assertEqual(progress.attempts_count, 1)
+        self.assertEqual(progress.best_submission_id, res.data["data"]["id"])
+
+    def test_finished_challenge_takes_no_more_submissions(self):
+        self.submit(status="accepted")
+
+        self.assertEqual(self.submit(status="accepted").status_code, 403)
+        self.assertEqual(self.total_score(), 10)
+        self.assertEqual(ChallengeSubmission.objects.filter(user=self.user).count(), 1)
+
+    def test_failed_attempts_are_counted(self):
+        self.submit(status="wrong_answer")
+        self.submit(status="wrong_answer")
+
+        progress = UserChallengeProgress.objects.get(user=self.user, challenge=self.challenge)
+        self.assertFalse(progress.is_completed)
+        self.assertEqual(progress.attempts_count, 2)
+        self.assertEqual(self.total_score(), 0)
+
+    def test_solved_without_score_is_refused(self):
+        self.assertEqual(self.submit(status="solved").status_code, 403)
+        self.assertFalse(ChallengeSubmission.objects.filter(user=self.user).exists())
+
+    def test_solved_spends_the_points_and_shows_the_answer(self):
+        UserChallengeScore.objects.filter(user=self.user).update(total_score=15)
+
+        res = self.submit(status="solved")
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.data["data"]["answer"], self.challenge.answer)
+        self.assertEqual(self.total_score(), 5)
+
+    @mock.patch("apis.v1.challenge.serializers.judge_submission")
+    def test_source_code_is_queued_for_the_judge(self, judge_submission):
+        challenge = Challenge.objects.create(name="echo", description={}, language="PY", level="easy")
+        ChallengeTestCase.objects.create(challenge=challenge, input_data="1", expected_output="1")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.submit(challenge, source_code="print(input())")
+
+        self.assertEqual(res.status_code, 201)
+        submission = ChallengeSubmission.objects.get(id=res.data["data"]["id"])
+        self.assertEqual(submission.status, "pending")
+        judge_submission.delay.assert_called_once_with(submission.id)
+        # the first one is still being judged
+        self.assertEqual(self.submit(challenge, source_code="print(input())").status_code, 403)
@@ -0,0 +1,91 @@
+import statistics
+import time
+from base64 import b64encode
+from urllib.parse import urlencode
+
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apis.utils.custom_pagination import (
+    TwentyPageNumberPagination,
+    ScrollPagination,
+    TwentyCursorPagination,
+    ScrollCursorPagination,
+)
+
+
+class Command(BaseCommand):
+    help = "Compares page 1 and a deep page latency of the page number and cursor paginators"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default="course_app.CategoryComment", help="app_label.ModelName")
+        parser.add_argument("--ordering", default="-id", choices=("-id", "id"))
+        parser.add_argument("--page", type=int, default=500, help="deep page number")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def _cursor(self, position):
+        # same token layout as rest_framework CursorPagination.encode_cursor
+        querystring = urlencode({"p": position}, doseq=True)
+        return b64encode(querystring.encode("ascii")).decode("ascii")
+
+    def _run(self, paginator_class, queryset, params, repeat, ordering):
+        factory = APIRequestFactory()
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            request = Request(factory.get("/", params))
+            paginator = paginator_class()
+            if isinstance(paginator, CursorPagination):
+                paginator.ordering = ordering
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                paginator.paginate_queryset(queryset, request)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = len(context.captured_queries)
+        return statistics.median(timings), queries
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options["model"])
+        except (LookupError, ValueError):
+            raise CommandError(f"model {options['model']} not found")
+
+        ordering = options["ordering"]
+        queryset = model._default_manager.order_by(ordering)
+        deep_page = options["page"]
+
+        paginators = (
+            ("TwentyPageNumberPagination", TwentyPageNumberPagination, TwentyCursorPagination),
+            ("ScrollPagination", ScrollPagination, ScrollCursorPagination),
+        )
+
+        self.stdout.write(f"{model._meta.db_table}: {queryset.count()} rows, ordering {ordering}")
+        for name, page_number_class, cursor_class in paginators:
+            page_size = page_number_class.page_size
+            # last row before the deep page, not part of the timing
+            position = queryset.values_list("id", flat=True)[(deep_page - 1) * page_size - 1:(deep_page - 1) * page_size].first()
+            if position is None:
+                self.stdout.write(self.style.WARNING(f"{name}: not enough rows for page {deep_page}"))
+                continue
+
+            runs = (
+                (f"{name} page 1", page_number_class, {}),
+                (f"{name} page {deep_page}", page_number_class, {"page": deep_page}),
+                (f"{cursor_class.__name__} page 1", cursor_class, {}),
+                (f"{cursor_class.__name__} page {deep_page}", cursor_class, {"cursor": self._cursor(position)}),
+            )
+            for label, paginator_class, params in runs:
+                try:
+                    median, queries = self._run(paginator_class, queryset, params, options["repeat"], ordering)
+                except NotFound:
+                    self.stdout.write(self.style.WARNING(f"{label}: page not found"))
+                    continue
+                self.stdout.write(f"{label:<45} {median:>9.2f} ms  {queries} queries")
+
+        self.stdout.write(self.style.SUCCESS("Successfully finished pagination benchmark"))
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apis.utils.custom_cache import bump_catalog_tags
+from .models import Photo
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+def refresh_photo_cache(sender, instance, created=False, **kwargs):
+    # a new photo is not used by the catalog yet (user uploads)
+    if created:
+        return
+    bump_catalog_tags("photo")
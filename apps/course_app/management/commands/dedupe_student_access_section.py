@@ -0,0 +1,50 @@
+from base.clasess.batch_command import KeysetBatchCommand
+from apps.course_app.models import StudentAccessSection
+
+
+class Command(KeysetBatchCommand):
+    help = (
+        "Removes duplicate (student, section) rows from student_access_section in small batches. "
+        "Keeps the row that grants access (then the oldest one). Safe to stop and re-run, "
+        "it resumes from the last finished batch. Run it before migration course_app 0006, "
+        "which refuses to build the unique index while duplicates are left."
+    )
+    table = StudentAccessSection._meta.db_table
+    key_column = "student_id"
+    checkpoint_key = "dedupe_student_access_section:last_student_id"
+    key_name = "student"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--lock-timeout", type=int, default=2000, help="lock_timeout per batch (ms)")
+
+    def process_batch(self, cursor, lower, upper, options):
+        cursor.execute("SELECT set_config('lock_timeout', %s, true)", [f"{options['lock_timeout']}ms"])
+        cursor.execute(
+            f"""
+            DELETE FROM {self.table} access
+            USING (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY student_id, section_id
+                        ORDER BY is_access DESC, is_active DESC, id
+                    ) AS position
+                    FROM {self.table}
+                    WHERE student_id > %s AND student_id <= %s
+                ) ranked
+                WHERE ranked.position > 1
+            ) duplicate
+            WHERE access.id = duplicate.id
+            """,
+            [lower, upper],
+        )
+        return cursor.rowcount
+
+    def describe_batch(self, count):
+        return f"removed {count} duplicate rows"
+
+    def handle(self, *args, **options):
+        total_deleted = self.run_batches(options)
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully removed {total_deleted} duplicate student_access_section rows")
+        )
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+def drop_invalid_index(apps, schema_editor):
+    # a failed or cancelled concurrent build leaves an invalid index, IF NOT EXISTS would keep it
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass('unique_student_access_section')"
+        )
+        row = cursor.fetchone()
+        if row and row[0]:
+            cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS unique_student_access_section")
+
+
+class Migration(migrations.Migration):
+    # the unique index is built without locking writes on student_access_section
+    atomic = False
+
+    dependencies = [
+        ('auth_app', '0004_alter_user_email'),
+        ('course_app', '0005_lessoncourse_student_number'),
+    ]
+
+    operations = [
+        # duplicates are removed in small batches by `dedupe_student_access_section`, not here
+        migrations.RunSQL(
+            sql="""
+            DO $$
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM student_access_section
+                    GROUP BY student_id, section_id
+                    HAVING COUNT(*) > 1
+                ) THEN
+                    RAISE EXCEPTION 'student_access_section has duplicate (student_id, section_id) rows, '
+                        'run `python manage.py dedupe_student_access_section` first';
+                END IF;
+            END $$;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunPython(drop_invalid_index, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""
+                    CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS unique_student_access_section
+                    ON student_access_section (student_id, section_id) INCLUDE (is_access)
+                    """,
+                    reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS unique_student_access_section",
+                ),
+                # only a catalog change, the index above is taken over by the constraint
+                migrations.RunSQL(
+                    sql="""
+                    ALTER TABLE student_access_section
+                    ADD CONSTRAINT unique_student_access_section UNIQUE USING INDEX unique_student_access_section
+                    """,
+                    reverse_sql="""
+                    ALTER TABLE student_access_section DROP CONSTRAINT IF EXISTS unique_student_access_section
+                    """,
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='studentaccesssection',
+                    constraint=models.UniqueConstraint(fields=('student', 'section'), include=('is_access',), name='unique_student_access_section'),
+                ),
+            ],
+        ),
+    ]
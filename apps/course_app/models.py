@@ -179,6 +179,14 @@ class StudentAccessSection(CreateMixin, UpdateMixin, ActiveMixin):
     class Meta:
         ordering = ("id",)
         db_table = "student_access_section"
+        constraints = [
+            # unique (student, section) index that also covers is_access for the access check
+            models.UniqueConstraint(
+                fields=("student", "section"),
+                include=("is_access",),
+                name="unique_student_access_section",
+            ),
+        ]
 
 
 class CategoryComment(MPTTModel, CreateMixin, UpdateMixin, ActiveMixin):
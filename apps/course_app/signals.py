@@ -0,0 +1,43 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apis.utils.custom_cache import bump_catalog_tags
+from apps.auth_app.models import Student
+from base.utils.grand_section_access import bump_starter_catalog_version
+from base.utils.section_access_cache import section_access_cache
+from .models import Category, Course, Section, LessonCourse, StudentAccessSection
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender=LessonCourse)
+@receiver(post_delete, sender=LessonCourse)
+def refresh_starter_sections(sender, instance, **kwargs):
+    bump_starter_catalog_version()
+
+
+@receiver(post_save, sender=StudentAccessSection)
+@receiver(post_delete, sender=StudentAccessSection)
+def refresh_section_access_cache(sender, instance, **kwargs):
+    # admin edits can also revoke access, so drop the whole set
+    user_id = Student.objects.filter(id=instance.student_id).values_list("user_id", flat=True).first()
+    if user_id:
+        section_access_cache.invalidate(user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_category_cache(sender, instance, **kwargs):
+    bump_catalog_tags("category")
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def refresh_course_cache(sender, instance, **kwargs):
+    bump_catalog_tags("course")
+
+
+@receiver(post_save, sender=LessonCourse)
+@receiver(post_delete, sender=LessonCourse)
+def refresh_lesson_course_cache(sender, instance, **kwargs):
+    bump_catalog_tags("lesson_course")
@@ -0,0 +1,73 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from uuid import uuid4
+
+from django.core.management import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.discount_app.models import Coupon
+from base.utils.coupon_redemption import reserve_coupon
+
+
+class Command(BaseCommand):
+    help = (
+        "Races many redeemers for one coupon and checks that no more than maximum_use uses are given out. "
+        "Creates a temporary coupon, removed at the end unless --keep is given"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--redeemers", type=int, default=5000, help="number of reservation attempts")
+        parser.add_argument("--threads", type=int, default=64, help="concurrent database connections")
+        parser.add_argument("--maximum-use", type=int, default=1000)
+        parser.add_argument("--keep", action="store_true", help="keep the coupon")
+
+    def _redeem(self, code):
+        try:
+            start = time.perf_counter()
+            coupon = reserve_coupon(code)
+            return coupon is not None, (time.perf_counter() - start) * 1000
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code=f"bench-{uuid4().hex[:16]}",
+            maximum_use=options["maximum_use"],
+            valid_from=now - timedelta(minutes=1),
+            valid_to=now + timedelta(hours=1),
+            amount="10",
+        )
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            results = list(executor.map(lambda _: self._redeem(coupon.code), range(options["redeemers"])))
+        wall = time.perf_counter() - start
+
+        reserved = sum(1 for success, _ in results if success)
+        timings = sorted(elapsed for _, elapsed in results)
+        self.stdout.write(
+            f"{len(results)} redeemers, {options['threads']} threads, {wall:.2f} s, {len(results) / wall:.1f} req/s"
+        )
+        self.stdout.write(
+            f"latency p50 {statistics.median(timings):.2f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms, max {timings[-1]:.2f} ms"
+        )
+
+        coupon.refresh_from_db(fields=("number_of_uses",))
+        expected = min(options["redeemers"], options["maximum_use"])
+        if reserved == expected and coupon.number_of_uses == expected:
+            self.stdout.write(self.style.SUCCESS(f"reserved {reserved} of {options['maximum_use']} uses, no oversell"))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"reserved {reserved}, number_of_uses {coupon.number_of_uses}, expected {expected}"
+            ))
+
+        if not options["keep"]:
+            coupon.delete()
+            self.stdout.write("benchmark coupon removed")
+
+        self.stdout.write(self.style.SUCCESS("Successfully finished coupon redemption benchmark"))
@@ -0,0 +1,127 @@
+import csv
+import secrets
+import time
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.discount_app.enums import CouponEnums
+from apps.discount_app.models import Coupon
+
+# no 0/O and 1/I/L, codes are typed by hand
+ALPHABET = "23456789ABCDEFGHJKMNPQRSTUVWXYZ"
+MAX_PASSES = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates single-use coupon codes in memory and loads them with COPY. "
+        "Codes that already exist in the coupon table are replaced in extra passes before the insert"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, required=True)
+        parser.add_argument("--amount", required=True, help="percent or toman, depending on --coupon-type")
+        parser.add_argument("--coupon-type", default=CouponEnums.percent, choices=CouponEnums.values)
+        parser.add_argument("--prefix", default="", help="campaign prefix of every code")
+        parser.add_argument("--length", type=int, default=10, help="random characters after the prefix")
+        parser.add_argument("--maximum-use", type=int, default=1)
+        parser.add_argument("--valid-days", type=int, default=30)
+        parser.add_argument("--output", help="csv file for the generated codes")
+
+    def _generate(self, count, prefix, length, taken):
+        codes = set()
+        while len(codes) < count:
+            code = prefix + "".join(secrets.choice(ALPHABET) for _ in range(length))
+            if code not in taken:
+                codes.add(code)
+        return codes
+
+    def _copy(self, cursor, codes):
+        # django wraps the psycopg cursor, COPY needs the raw one
+        with cursor.cursor.copy("COPY coupon_import (code) FROM STDIN") as copy:
+            for code in codes:
+                copy.write_row((code,))
+
+    def _collisions(self, cursor, table):
+        cursor.execute(
+            f"""
+            DELETE FROM coupon_import staged
+            USING {table} coupon
+            WHERE coupon.code = staged.code
+            RETURNING staged.code
+            """
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+    def handle(self, *args, **options):
+        count, prefix, length = options["count"], options["prefix"], options["length"]
+        if len(prefix) + length > Coupon._meta.get_field("code").max_length:
+            raise CommandError("prefix + length is longer than the code column")
+        # the code space has to be much bigger than the campaign for the generator to finish quickly
+        if len(ALPHABET) ** length < count * 100:
+            raise CommandError("--length is too short for this many codes")
+
+        table = Coupon._meta.db_table
+        now = timezone.now()
+
+        start = time.perf_counter()
+        codes = self._generate(count, prefix, length, set())
+        generated_at = time.perf_counter()
+        self.stdout.write(f"generated {count} codes in {generated_at - start:.2f} s")
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("CREATE TEMP TABLE coupon_import (code varchar(50) PRIMARY KEY) ON COMMIT DROP")
+            self._copy(cursor, codes)
+            copied_at = time.perf_counter()
+            self.stdout.write(
+                f"copied {count} codes in {copied_at - generated_at:.2f} s, {count / (copied_at - generated_at):.0f} rows/s"
+            )
+
+            # second pass, replace codes that already exist until none is left
+            for _ in range(MAX_PASSES):
+                collisions = self._collisions(cursor, table)
+                if not collisions:
+                    break
+                codes -= collisions
+                replacements = self._generate(len(collisions), prefix, length, codes | collisions)
+                self._copy(cursor, replacements)
+                codes |= replacements
+                self.stdout.write(f"replaced {len(collisions)} existing codes")
+            else:
+                raise CommandError("existing codes could not be avoided, use a longer --length or another --prefix")
+
+            cursor.execute(
+                f"""
+                INSERT INTO {table}
+                    (code, maximum_use, number_of_uses, valid_from, valid_to, coupon_type, amount,
+                     is_active, created_at, updated_at)
+                SELECT code, %s, 0, %s, %s, %s, %s, TRUE, %s, %s FROM coupon_import
+                ON CONFLICT (code) DO NOTHING
+                RETURNING code
+                """,
+                [
+                    options["maximum_use"],
+                    now,
+                    now + timedelta(days=options["valid_days"]),
+                    options["coupon_type"],
+                    options["amount"],
+                    now,
+                    now,
+                ],
+            )
+            # a code inserted by someone else since the last pass is skipped, not failed
+            inserted = {row[0] for row in cursor.fetchall()}
+
+        elapsed = time.perf_counter() - start
+        if options["output"]:
+            with open(options["output"], "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(("code",))
+                writer.writerows((code,) for code in sorted(inserted))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully created {len(inserted)} coupons in {elapsed:.2f} s, {len(inserted) / elapsed:.0f} coupons/s"
+        ))
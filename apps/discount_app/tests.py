@@ -1,3 +1,67 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from apps.discount_app.models import Coupon
+from base.utils.coupon_redemption import reserve_coupon, release_coupon
+
+
+class ReserveCouponTests(TransactionTestCase):
+    def create_coupon(self, **kwargs):
+        now = timezone.now()
+        fields = {
+            "code": "SPRING",
+            "maximum_use": 3,
+            "valid_from": now - timedelta(days=1),
+            "valid_to": now + timedelta(days=1),
+            "amount": "10",
+        }
+        fields.update(kwargs)
+        return Coupon.objects.create(**fields)
+
+    def test_concurrent_reservations_do_not_oversell(self):
+        coupon = self.create_coupon(maximum_use=3)
+        workers = 10
+        barrier = threading.Barrier(workers)
+        reserved = []
+
+        def reserve():
+            try:
+                barrier.wait()
+                if reserve_coupon(coupon.code) is not None:
+                    reserved.append(1)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserve) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        coupon.refresh_from_db()
+        self.assertEqual(len(reserved), 3)
+        self.assertEqual(coupon.number_of_uses, 3)
+
+    def test_invalid_coupons_are_not_reserved(self):
+        now = timezone.now()
+        self.create_coupon(code="USED", maximum_use=1, number_of_uses=1)
+        self.create_coupon(code="EXPIRED", valid_to=now - timedelta(minutes=1))
+        self.create_coupon(code="INACTIVE", is_active=False)
+
+        for code in ("USED", "EXPIRED", "INACTIVE", "MISSING"):
+            self.assertIsNone(reserve_coupon(code), code)
+
+    def test_release_gives_back_one_use(self):
+        coupon = self.create_coupon(maximum_use=1)
+        self.assertIsNotNone(reserve_coupon(coupon.code))
+        self.assertIsNone(reserve_coupon(coupon.code))
+
+        release_coupon(coupon.id)
+        release_coupon(coupon.id)
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.number_of_uses, 0)
+        self.assertIsNotNone(reserve_coupon(coupon.code))
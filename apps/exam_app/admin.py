@@ -87,6 +87,8 @@ class StudentExamAttemptAdmin(admin.ModelAdmin):
         "started_at",
         "submitted_at",
         "obtained_score",
+        "answered_count",
+        "correct_count",
         "is_passed",
         "status"
     )
@@ -103,6 +105,8 @@ class StudentExamAttemptAdmin(admin.ModelAdmin):
             "started_at",
             "submitted_at",
             "obtained_score",
+            "answered_count",
+            "correct_count",
             "is_passed",
             "status",
             "created_at",
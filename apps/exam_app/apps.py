@@ -6,4 +6,4 @@ class ExamAppConfig(AppConfig):
     name = 'apps.exam_app'
 
     def ready(self):
-        pass
+        from . import signals  # noqa: F401
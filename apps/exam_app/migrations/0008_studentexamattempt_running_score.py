@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_running_score(apps, schema_editor):
+    StudentExamAttempt = apps.get_model("exam_app", "StudentExamAttempt")
+    StudentAnswer = apps.get_model("exam_app", "StudentAnswer")
+
+    answers = StudentAnswer.objects.filter(
+        attempt_id=OuterRef("pk"), is_active=True
+    ).values("attempt_id")
+
+    StudentExamAttempt.objects.update(
+        answered_count=Coalesce(Subquery(answers.annotate(total=Count("id")).values("total")), Value(0)),
+        correct_count=Coalesce(
+            Subquery(answers.annotate(total=Count("id", filter=Q(is_correct=True))).values("total")), Value(0)
+        ),
+    )
+    # done attempts already have their final score
+    StudentExamAttempt.objects.filter(status="in_progress").update(
+        obtained_score=Coalesce(
+            Subquery(answers.annotate(total=Sum("score", filter=Q(is_correct=True))).values("total")), Value(0.0)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam_app', '0007_alter_studentexamattempt_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentexamattempt',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد سوالات پاسخ داده شده'),
+        ),
+        migrations.AddField(
+            model_name='studentexamattempt',
+            name='correct_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد پاسخ های صحیح'),
+        ),
+        migrations.RunPython(backfill_running_score, migrations.RunPython.noop),
+    ]
@@ -144,10 +144,19 @@ class StudentExamAttempt(CreateMixin, UpdateMixin, ActiveMixin):
     #     default=0,
     #     verbose_name=_("نمره کل")
     # )
+    # running totals, updated whenever an answer is graded
     obtained_score = models.FloatField(
         default=0,
         verbose_name=_("نمره کسب شده")
     )
+    answered_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("تعداد سوالات پاسخ داده شده")
+    )
+    correct_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("تعداد پاسخ های صحیح")
+    )
     is_passed = models.BooleanField(
         default=False,
         verbose_name=_("قبول شده")
@@ -1,12 +1,33 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Question
+
+from apis.utils.custom_cache import bump_catalog_tags, EXAM_CONTENT_TAG
+from base.utils.exam_answer_key import invalidate_exam_answer_key
+from .models import SectionExam, Question, Choice
+
+
+def refresh_exam_cache(exam_id):
+    invalidate_exam_answer_key(exam_id)
+    bump_catalog_tags(EXAM_CONTENT_TAG.format(exam_id=exam_id))
+
+
+@receiver(post_save, sender=SectionExam)
+@receiver(post_delete, sender=SectionExam)
+def refresh_section_exam_cache(sender, instance, **kwargs):
+    # passing_score is part of the question payload
+    bump_catalog_tags(EXAM_CONTENT_TAG.format(exam_id=instance.id))
 
 
 @receiver(post_save, sender=Question)
-async def increasing_display_order(sender, instance, created, **kwargs):
-    if created:
-        count_question = await Question.objects.filter(exam_id=instance.exam_id).acount()
-        await Question.objects.only("display_order").filter(id=instance.id).aupdate(
-            display_order=count_question
-        )
+@receiver(post_delete, sender=Question)
+def refresh_question_cache(sender, instance, **kwargs):
+    refresh_exam_cache(instance.exam_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def refresh_choice_cache(sender, instance, **kwargs):
+    # get exam of the choice
+    exam_id = Question.objects.filter(id=instance.question_id).values_list("exam_id", flat=True).first()
+    if exam_id:
+        refresh_exam_cache(exam_id)
@@ -1,3 +1,159 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apis.v1.course.serializers import BulkStudentAnswerSerializer
+from apps.auth_app.models import User, Student
+from apps.course_app.models import Category, Course, Section, StudentAccessSection
+from apps.exam_app.models import SectionExam, Question, Choice, StudentExamAttempt, StudentAnswer
+
+
+class ExamAnswerTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(mobile_phone="09120000001")
+        self.student = Student.objects.get(user=self.user)
+        self.client.force_authenticate(self.user)
+
+        # the signals bump the cached answer key and exam content, keys left by an earlier run are not read
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.add_root(category_name="python")
+            course = Course.objects.create(
+                category=category, course_name="python", course_description="python", time_course="10"
+            )
+            self.section = Section.objects.create(course=course, title="first")
+            self.next_section = Section.objects.create(course=course, title="second")
+            self.exam = SectionExam.objects.create(section=self.section, title="quiz", passing_score=5)
+
+            self.question_1 = Question.objects.create(exam=self.exam, question_type="multiple_choice", score=2)
+            self.right_1 = Choice.objects.create(question=self.question_1, choice_text="a", is_correct=True)
+            self.wrong_1 = Choice.objects.create(question=self.question_1, choice_text="b")
+            self.question_2 = Question.objects.create(exam=self.exam, question_type="multiple_choice", score=3)
+            self.right_2 = Choice.objects.create(question=self.question_2, choice_text="c", is_correct=True)
+            self.wrong_2 = Choice.objects.create(question=self.question_2, choice_text="d")
+            self.question_code = Question.objects.create(exam=self.exam, question_type="code", score=5)
+
+        self.attempt = StudentExamAttempt.objects.create(student=self.student, exam=self.exam)
+
+    def bulk_answer(self, answers):
+        return self.client.post(
+            reverse("v1_course:exam_bulk_answer", kwargs={"exam_pk": self.exam.id}),
+            {"answers": answers},
+            format="json",
+        )
+
+    def assert_attempt_totals(self, obtained_score, correct_count, answered_count):
+        self.attempt.refresh_from_db()
+        self.assertEqual(
+            (self.attempt.obtained_score, self.attempt.correct_count, self.attempt.answered_count),
+            (obtained_score, correct_count, answered_count),
+        )
+
+
+class BulkStudentAnswerTests(ExamAnswerTestMixin, APITestCase):
+    def test_answers_are_graded_in_one_pass(self):
+        res = self.bulk_answer([
+            {"question": self.question_1.id, "selected_choices": [self.right_1.id]},
+            {"question": self.question_2.id, "selected_choices": [self.wrong_2.id]},
+            {"question": self.question_code.id, "status": "accepted"},
+        ])
+
+        self.assertEqual(res.status_code, 201)
+        answers = {answer.question_id: answer for answer in StudentAnswer.objects.filter(attempt=self.attempt)}
+        self.assertEqual(len(answers), 3)
+        self.assertTrue(answers[self.question_1.id].is_correct)
+        self.assertFalse(answers[self.question_2.id].is_correct)
+        self.assertEqual(answers[self.question_code.id].score, 5)
+        self.assertEqual(
+            list(answers[self.question_2.id].selected_choices.values_list("id", flat=True)), [self.wrong_2.id]
+        )
+        self.assert_attempt_totals(7, 2, 3)
+
+    def test_choice_of_another_question_is_rejected(self):
+        res = self.bulk_answer([{"question": self.question_1.id, "selected_choices": [self.right_2.id]}])
+
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(StudentAnswer.objects.filter(attempt=self.attempt).exists())
+
+    def test_answered_question_is_rejected(self):
+        self.bulk_answer([{"question": self.question_1.id, "selected_choices": [self.right_1.id]}])
+        res = self.bulk_answer([{"question": self.question_1.id, "selected_choices": [self.wrong_1.id]}])
+
+        self.assertEqual(res.status_code, 400)
+        self.assert_attempt_totals(2, 1, 1)
+
+    def test_concurrent_duplicate_returns_400(self):
+        validate = BulkStudentAnswerSerializer.validate
+
+        def validate_then_answer(serializer, attrs):
+            attrs = validate(serializer, attrs)
+            # another request answers the same question between validate and the insert
+            StudentAnswer.objects.create(student=self.student, attempt=self.attempt, question=self.question_1)
+            return attrs
+
+        with mock.patch.object(BulkStudentAnswerSerializer, "validate", validate_then_answer):
+            res = self.bulk_answer([
+                {"question": self.question_2.id, "selected_choices": [self.right_2.id]},
+                {"question": self.question_1.id, "selected_choices": [self.right_1.id]},
+            ])
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(StudentAnswer.objects.filter(attempt=self.attempt).count(), 1)
+        self.assert_attempt_totals(0, 0, 0)
+
+
+class RunningScoreTests(ExamAnswerTestMixin, APITestCase):
+    def answer(self, question, **data):
+        return self.client.post(
+            reverse("v1_course:student-answer-list", kwargs={"exam_pk": self.exam.id, "question_pk": question.id}),
+            data,
+            format="json",
+        )
+
+    def test_answer_adds_to_the_running_score(self):
+        self.assertEqual(self.answer(self.question_1, selected_choices=[self.right_1.id]).status_code, 201)
+        self.assertEqual(self.answer(self.question_2, selected_choices=[self.wrong_2.id]).status_code, 201)
+
+        self.assert_attempt_totals(2, 1, 2)
+
+    def test_regrade_moves_the_running_score(self):
+        answer_id = self.answer(self.question_1, selected_choices=[self.right_1.id]).data["id"]
+        res = self.client.patch(
+            reverse(
+                "v1_course:student-answer-detail",
+                kwargs={"exam_pk": self.exam.id, "question_pk": self.question_1.id, "pk": answer_id},
+            ),
+            {"selected_choices": [self.wrong_1.id]},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assert_attempt_totals(0, 0, 1)
+
+    def test_exam_done_uses_the_running_score(self):
+        self.bulk_answer([
+            {"question": self.question_1.id, "selected_choices": [self.right_1.id]},
+            {"question": self.question_2.id, "selected_choices": [self.right_2.id]},
+        ])
+
+        res = self.client.post(reverse("v1_course:exam_done"), {"exam_id": self.exam.id}, format="json")
+
+        self.assertEqual(res.status_code, 200)
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, "done")
+        self.assertTrue(self.attempt.is_passed)
+        self.assertTrue(
+            StudentAccessSection.objects.filter(
+                student=self.student, section=self.next_section, is_access=True
+            ).exists()
+        )
+
+    def test_finished_exam_takes_no_answers(self):
+        self.client.post(reverse("v1_course:exam_done"), {"exam_id": self.exam.id}, format="json")
+
+        self.assertEqual(self.answer(self.question_1, selected_choices=[self.right_1.id]).status_code, 404)
+        self.assertEqual(
+            self.bulk_answer([{"question": self.question_1.id, "selected_choices": [self.right_1.id]}]).status_code,
+            404,
+        )
+        self.assert_attempt_totals(0, 0, 0)
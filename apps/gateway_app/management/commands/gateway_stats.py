@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+
+from base.clasess.gateway_client import get_gateway_latency_stats, reset_gateway_latency_stats
+
+
+class Command(BaseCommand):
+    help = "Shows the latency histogram and the outcomes of the payment gateway requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="reset the histograms")
+
+    def handle(self, *args, **options):
+        for name, stats in get_gateway_latency_stats().items():
+            quantiles = ", ".join(
+                f"p{quantile} <= {stats[f'p{quantile}_ms'] or 'inf'} ms" for quantile in (50, 95, 99)
+            )
+            self.stdout.write(
+                f"{name}: {stats['count']} requests, avg {stats['avg_ms']:.1f} ms, {quantiles}, "
+                f"ok {stats['ok']}, error {stats['error']}, timeout {stats['timeout']}, circuit open {stats['open']}"
+            )
+
+        if options["reset"]:
+            reset_gateway_latency_stats()
+            self.stdout.write(self.style.SUCCESS("Successfully reset gateway latency histograms"))
@@ -0,0 +1,106 @@
+import asyncio
+import itertools
+import json
+import random
+from collections import Counter
+from uuid import uuid4
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local zibal and bazaar stub with keep-alive, for load tests of GatewayView and VerifyPayment "
+        "without the real gateways. Point ZIBAL_REQUEST_URL, ZIBAL_VERIFY_URL and BAZAAR_PAY_URL at it"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8099)
+        parser.add_argument("--latency", type=float, default=50, help="response delay (ms)")
+        parser.add_argument("--jitter", type=float, default=20, help="random extra delay up to this value (ms)")
+        parser.add_argument("--error-rate", type=float, default=0, help="share of requests answered with 500")
+        parser.add_argument("--hang-rate", type=float, default=0, help="share of requests that never get an answer")
+        parser.add_argument("--verify-status", type=int, default=1, help="status returned by verify (1 paid, 3 canceled)")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.track_ids = itertools.count(int(timezone.now().timestamp()))
+        self.amounts = {}
+        self.counter = Counter()
+
+        base_url = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(f"ZIBAL_REQUEST_URL={base_url}/v1/request")
+        self.stdout.write(f"ZIBAL_VERIFY_URL={base_url}/v1/verify")
+        self.stdout.write(f"BAZAAR_PAY_URL={base_url}/checkout")
+        self.base_url = base_url
+
+        try:
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Successfully stopped stub gateway, requests: {dict(self.counter)}"))
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle_connection, self.options["host"], self.options["port"])
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            # several requests per connection, like the pooled client sends them
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode().split(" ", 2)
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self._route(path.split("?", 1)[0], json.loads(body or b"{}"))
+                content = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(content)}\r\nConnection: keep-alive\r\n\r\n".encode() + content
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, path, body):
+        self.counter[path] += 1
+        options = self.options
+        if random.random() < options["hang_rate"]:
+            await asyncio.sleep(3600)
+        await asyncio.sleep((options["latency"] + random.uniform(0, options["jitter"])) / 1000)
+        if random.random() < options["error_rate"]:
+            return "500 Internal Server Error", {"message": "stub error"}
+
+        if path == "/v1/request":
+            track_id = next(self.track_ids)
+            self.amounts[track_id] = body.get("amount")
+            return "200 OK", {"trackId": track_id, "result": 100, "message": "success"}
+
+        if path == "/v1/verify":
+            track_id = body.get("trackId")
+            return "200 OK", {
+                "paidAt": timezone.now().isoformat(),
+                "amount": self.amounts.get(track_id),
+                "result": 100,
+                "status": options["verify_status"],
+                "refNumber": track_id,
+                "message": "success",
+            }
+
+        if path == "/checkout":
+            token = uuid4().hex
+            return "200 OK", {"payment_url": f"{self.base_url}/pay?token={token}", "checkout_token": token}
+
+        return "404 Not Found", {"message": "not found"}
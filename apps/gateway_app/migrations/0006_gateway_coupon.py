@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discount_app', '0002_alter_coupon_code_alter_coupon_number_of_uses'),
+        ('gateway_app', '0005_gateway_checkout_token_gateway_gateway_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gateway',
+            name='coupon',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='gateways', to='discount_app.coupon'),
+        ),
+    ]
@@ -21,6 +21,14 @@ class Gateway(CreateMixin, UpdateMixin, ActiveMixin):
     track_id = models.CharField(max_length=20, blank=True, null=True)
     gateway_name = models.CharField(max_length=255, blank=True, null=True)
     checkout_token = models.CharField(max_length=255, blank=True, null=True)
+    # reserved use of the coupon, given back when the payment fails
+    coupon = models.ForeignKey(
+        "discount_app.Coupon",
+        on_delete=models.PROTECT,
+        related_name="gateways",
+        blank=True,
+        null=True,
+    )
 
     class Meta:
         db_table = "gateway"
@@ -0,0 +1,14 @@
+from celery import shared_task
+
+from base.utils.payment_reconciliation import reconcile_batch, RECONCILE_BATCH_SIZE
+
+
+@shared_task
+def reconcile_payments():
+    # payments that are still waiting stay behind the cursor until the next run
+    last_id, checked, paid, failed = 0, RECONCILE_BATCH_SIZE, 0, 0
+    while checked == RECONCILE_BATCH_SIZE:
+        checked, last_id, batch_paid, batch_failed = reconcile_batch(last_id)
+        paid += batch_paid
+        failed += batch_failed
+    return {"paid": paid, "failed": failed}
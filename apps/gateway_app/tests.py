@@ -1,3 +1,122 @@
-from django.test import TestCase
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from uuid import uuid4
 
-# Create your tests here.
+from adrf.views import APIView as AsyncAPIView
+from django.test import SimpleTestCase
+from django_redis import get_redis_connection
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from apis.utils.custom_idempotency import idempotent, IDEMPOTENCY_HEADER, _release_lock
+
+
+class CountingView(APIView):
+    calls = 0
+    delay = 0
+    status_code = 201
+
+    @idempotent
+    def post(self, request):
+        type(self).calls += 1
+        time.sleep(self.delay)
+        return Response({"call": type(self).calls, "body": request.data}, status=self.status_code)
+
+
+class AsyncCountingView(AsyncAPIView):
+    calls = 0
+
+    @idempotent
+    async def post(self, request):
+        type(self).calls += 1
+        await asyncio.sleep(0.2)
+        return Response({"call": type(self).calls}, status=201)
+
+
+class IdempotencyTests(SimpleTestCase):
+    def setUp(self):
+        self.user = SimpleNamespace(id=1, is_authenticated=True)
+        self.key = uuid4().hex
+        CountingView.calls, CountingView.delay, CountingView.status_code = 0, 0, 201
+        AsyncCountingView.calls = 0
+
+    def request(self, data=None, key=None):
+        headers = {IDEMPOTENCY_HEADER: key or self.key} if key is not False else {}
+        request = APIRequestFactory().post("/pay/", data or {"plan": 1}, format="json", headers=headers)
+        force_authenticate(request, user=self.user)
+        return request
+
+    def post(self, **kwargs):
+        return CountingView.as_view()(self.request(**kwargs))
+
+    def test_duplicate_gets_the_first_response(self):
+        first = self.post()
+        second = self.post()
+
+        self.assertEqual(CountingView.calls, 1)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        first.render()
+        self.assertEqual(second.content, first.content)
+
+    def test_same_key_with_another_body_is_refused(self):
+        self.post()
+
+        self.assertEqual(self.post(data={"plan": 2}).status_code, 422)
+        self.assertEqual(CountingView.calls, 1)
+
+    def test_requests_without_the_header_are_not_touched(self):
+        self.post(key=False)
+        self.post(key=False)
+
+        self.assertEqual(CountingView.calls, 2)
+
+    def test_server_errors_are_not_saved(self):
+        CountingView.status_code = 502
+        self.post()
+        CountingView.status_code = 201
+
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(CountingView.calls, 2)
+
+    def test_concurrent_duplicates_run_the_handler_once(self):
+        CountingView.delay = 0.3
+        responses = []
+
+        def post():
+            responses.append(self.post())
+
+        threads = [threading.Thread(target=post) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(CountingView.calls, 1)
+        self.assertEqual([response.status_code for response in responses], [201] * 5)
+
+    def test_async_concurrent_duplicates_run_the_handler_once(self):
+        view = AsyncCountingView.as_view()
+
+        async def post_all():
+            return await asyncio.gather(*(view(self.request()) for _ in range(5)))
+
+        responses = asyncio.run(post_all())
+
+        self.assertEqual(AsyncCountingView.calls, 1)
+        self.assertEqual([response.status_code for response in responses], [201] * 5)
+
+    def test_lock_of_another_request_is_not_released(self):
+        redis = get_redis_connection("default")
+        lock_key = f"idempotency_lock:test:{self.key}"
+        redis.set(lock_key, "other", ex=60)
+        self.addCleanup(redis.delete, lock_key)
+
+        _release_lock(lock_key, "mine")
+        self.assertEqual(redis.get(lock_key), b"other")
+
+        _release_lock(lock_key, "other")
+        self.assertIsNone(redis.get(lock_key))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:39
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the index is built without locking writes on user_subscription
+    atomic = False
+
+    dependencies = [
+        ('subscription_app', '0002_alter_subscriptionplan_discounted_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='usersubscription',
+            index=models.Index(condition=models.Q(('is_active', True), ('status', 'active')), fields=['user', 'end_date'], include=('start_date',), name='user_subscription_active_idx'),
+        ),
+    ]
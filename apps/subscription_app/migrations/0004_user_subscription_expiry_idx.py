@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:30
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the index is built without locking writes on user_subscription
+    atomic = False
+
+    dependencies = [
+        ('subscription_app', '0003_user_subscription_active_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='usersubscription',
+            index=models.Index(condition=models.Q(('is_active', True), ('status', 'active')), fields=['end_date'], name='user_subscription_expiry_idx'),
+        ),
+    ]
@@ -96,6 +96,21 @@ class UserSubscription(CreateMixin, UpdateMixin, ActiveMixin):
         verbose_name = _("اشتراک کاربر")
         verbose_name_plural = _("اشتراک‌های کاربران")
         ordering = ('id',)
+        indexes = [
+            # only running subscriptions of one user, the entitlement lookup and active_plan()
+            models.Index(
+                fields=("user", "end_date"),
+                include=("start_date",),
+                condition=models.Q(status="active", is_active=True),
+                name="user_subscription_active_idx",
+            ),
+            # running subscriptions by end_date for the expiry sweeper, which has no user in its WHERE
+            models.Index(
+                fields=("end_date",),
+                condition=models.Q(status="active", is_active=True),
+                name="user_subscription_expiry_idx",
+            ),
+        ]
 
 
 class InstallmentPlan(CreateMixin, UpdateMixin, ActiveMixin):
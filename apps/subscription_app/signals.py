@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apis.utils.custom_cache import bump_catalog_tags
+from base.utils.entitlement_cache import invalidate_entitlements
+from .models import SubscriptionPlan, InstallmentPlan, UserSubscription
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+def refresh_subscription_plan_cache(sender, instance, **kwargs):
+    bump_catalog_tags("subscription_plan")
+
+
+@receiver(post_save, sender=InstallmentPlan)
+@receiver(post_delete, sender=InstallmentPlan)
+def refresh_installment_plan_cache(sender, instance, **kwargs):
+    bump_catalog_tags("installment_plan")
+
+
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+def refresh_entitlement_cache(sender, instance, **kwargs):
+    invalidate_entitlements(instance.user_id)
@@ -0,0 +1,13 @@
+from celery import shared_task
+
+from base.utils.subscription_expiry import expire_subscriptions_batch, EXPIRY_BATCH_SIZE
+
+
+@shared_task
+def expire_subscriptions():
+    expired = 0
+    while True:
+        count = expire_subscriptions_batch()
+        expired += count
+        if count < EXPIRY_BATCH_SIZE:
+            return expired
@@ -1,3 +1,89 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from apis.utils.custom_cache import CATALOG_TAG_KEY
+from apps.auth_app.models import User
+from apps.subscription_app.models import SubscriptionPlan, UserSubscription
+from base.utils import entitlement_cache
+from base.utils.entitlement_cache import (
+    get_entitlements, has_active_subscription, ENTITLEMENT_EMPTY_TIMEOUT, ENTITLEMENT_MAX_TIMEOUT
+)
+
+
+class EntitlementCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(mobile_phone="09120000003")
+        self.plan = SubscriptionPlan.objects.create(name="monthly", duration=1, original_price=100000)
+        # ids restart with every test database, an entry cached by an earlier run is not read
+        cache.delete(CATALOG_TAG_KEY.format(tag=entitlement_cache.ENTITLEMENT_TAG.format(user_id=self.user.id)))
+
+    def subscribe(self, start=timedelta(days=-1), end=timedelta(days=30), **kwargs):
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            return UserSubscription.objects.create(
+                user=self.user, plan=self.plan, start_date=now + start, end_date=now + end, **kwargs
+            )
+
+    def test_no_subscription(self):
+        self.assertEqual(get_entitlements(self.user.id), {})
+        self.assertFalse(has_active_subscription(self.user.id))
+
+    def test_subscription_write_invalidates_the_entry(self):
+        self.assertFalse(has_active_subscription(self.user.id, self.plan.id))
+
+        subscription = self.subscribe()
+        self.assertEqual(get_entitlements(self.user.id), {self.plan.id: int(subscription.end_date.timestamp())})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.status = "canceled"
+            subscription.save()
+        self.assertFalse(has_active_subscription(self.user.id, self.plan.id))
+
+    def test_entry_is_read_from_the_cache(self):
+        subscription = self.subscribe()
+        get_entitlements(self.user.id)
+
+        # no signal, the cached entry is still served
+        UserSubscription.objects.filter(id=subscription.id).update(status="canceled")
+        self.assertTrue(has_active_subscription(self.user.id, self.plan.id))
+
+    def test_fill_from_rows_read_before_an_invalidation_is_not_served(self):
+        subscription = self.subscribe()
+        load = entitlement_cache._load_entitlements
+
+        def load_then_cancel(user_id):
+            result = load(user_id)
+            # the subscription is canceled and committed while the old rows are being cached
+            with self.captureOnCommitCallbacks(execute=True):
+                subscription.status = "canceled"
+                subscription.save()
+            return result
+
+        with mock.patch.object(entitlement_cache, "_load_entitlements", load_then_cancel):
+            self.assertTrue(has_active_subscription(self.user.id, self.plan.id))
+        self.assertFalse(has_active_subscription(self.user.id, self.plan.id))
+
+    def test_future_subscription_is_not_active_yet(self):
+        self.subscribe(start=timedelta(days=1), end=timedelta(days=31))
+
+        self.assertFalse(has_active_subscription(self.user.id))
+
+    def test_empty_entry_timeout(self):
+        self.assertEqual(entitlement_cache._load_entitlements(self.user.id)[1], ENTITLEMENT_EMPTY_TIMEOUT)
+
+    def test_entry_lives_until_the_subscription_ends(self):
+        # paid users are not capped by the short empty timeout
+        self.subscribe(end=timedelta(hours=2))
+
+        timeout = entitlement_cache._load_entitlements(self.user.id)[1]
+        self.assertGreater(timeout, ENTITLEMENT_EMPTY_TIMEOUT)
+        self.assertLessEqual(timeout, 2 * 60 * 60)
+
+    def test_long_subscription_is_capped(self):
+        self.subscribe(end=timedelta(days=60))
 
-# Create your tests here.
+        self.assertEqual(entitlement_cache._load_entitlements(self.user.id)[1], ENTITLEMENT_MAX_TIMEOUT)
@@ -6,6 +6,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'base.settings')
 
 django_application = get_asgi_application()
 
+from base.clasess.gateway_client import close_gateway_clients  # noqa: E402
+from base.utils.payment_status import close_payment_status_listener  # noqa: E402
+
 async def application(scope, receive, send):
     if scope['type'] == 'lifespan':
         while True:
@@ -15,6 +18,8 @@ async def application(scope, receive, send):
                 await send({'type': 'lifespan.startup.complete'})
             elif message['type'] == 'lifespan.shutdown':
                 # print("❌ Django ASGI shutdown event received")
+                await close_gateway_clients()
+                await close_payment_status_listener()
                 await send({'type': 'lifespan.shutdown.complete'})
                 return
     else:
@@ -0,0 +1,73 @@
+import time
+
+from django.core.cache import cache
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+
+
+class KeysetBatchCommand(BaseCommand):
+    """
+    walks `table` in ranges of `batch_size` distinct `key_column` values, one short transaction per range.
+    the last finished key is saved under `checkpoint_key`, a stopped run resumes after it
+    """
+    table = None
+    key_column = None
+    checkpoint_key = None
+    # used in the progress output, "student" --> "students <= 42: ..."
+    key_name = "key"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help=f"number of {self.key_name}s per batch")
+        parser.add_argument("--sleep", type=float, default=0.1, help="pause between batches (seconds)")
+        parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+
+    def process_batch(self, cursor, lower, upper, options):
+        """work on lower < key_column <= upper inside the transaction of the batch, returns the row count"""
+        raise NotImplementedError
+
+    def describe_batch(self, count):
+        return f"{count} rows"
+
+    def _next_upper_bound(self, cursor, last_key, batch_size):
+        cursor.execute(
+            f"""
+            SELECT MAX({self.key_column}) FROM (
+                SELECT DISTINCT {self.key_column} FROM {self.table}
+                WHERE {self.key_column} > %s
+                ORDER BY {self.key_column}
+                LIMIT %s
+            ) batch
+            """,
+            [last_key, batch_size],
+        )
+        return cursor.fetchone()[0]
+
+    def run_batches(self, options):
+        """every batch until the table is done, returns the total row count"""
+        if options["restart"]:
+            cache.delete(self.checkpoint_key)
+        last_key = cache.get(self.checkpoint_key) or 0
+        if last_key:
+            self.stdout.write(f"resuming after {self.key_name} id {last_key}")
+
+        total = 0
+        while True:
+            with connection.cursor() as cursor:
+                upper = self._next_upper_bound(cursor, last_key, options["batch_size"])
+            if upper is None:
+                break
+
+            # each batch is its own short transaction
+            with transaction.atomic(), connection.cursor() as cursor:
+                count = self.process_batch(cursor, last_key, upper, options)
+
+            total += count
+            last_key = upper
+            cache.set(self.checkpoint_key, last_key, timeout=None)
+            self.stdout.write(f"{self.key_name}s <= {upper}: {self.describe_batch(count)}")
+
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        cache.delete(self.checkpoint_key)
+        return total
@@ -1,8 +1,7 @@
 import asyncio
 from decouple import config
-import httpx
 
-from apis.utils.custom_exceptions import RequestTimeOut
+from base.clasess.gateway_client import zibal_client, bazaar_client
 
 # ZIBAL
 ZIBAL_API_KEY = config("ZIBAL_API_KEY", cast=str, default="")
@@ -26,17 +25,17 @@ class Gateway:
             "Content-Type": "application/json",
         }
 
-    async def _post(self, body, url, headers=None):
+    async def _post(self, body, url, operation, headers=None, idempotent=False):
         if headers:
             self.headers.update(headers)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url=url,
-                headers=headers,
-                json=body,
-            )
-            return response.json()
+        return await zibal_client.post_json(
+            url=url,
+            body=body,
+            operation=operation,
+            headers=self.headers,
+            idempotent=idempotent,
+        )
 
     async def request_payment(
             self,
@@ -54,7 +53,7 @@ class Gateway:
             "mobile": mobile
             }
         url = self.__reqeust_payment_url
-        result = await self._post(data, url)
+        result = await self._post(data, url, operation="request")
         return result
 
     async def verify_payment(self, track_id: int):
@@ -63,7 +62,8 @@ class Gateway:
             "trackId": track_id,
         }
         url = self.__verify_payment_url
-        result = await self._post(data, url)
+        # verify is idempotent on zibal, a timed out verify is sent again
+        result = await self._post(data, url, operation="verify", idempotent=True)
         return result
 
 
@@ -91,12 +91,7 @@ async def bazaar(
         "destination": destination,
         "service_name": service_name,
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(url=url, headers=headers, json=json, timeout=10)
-        except httpx.ConnectTimeout:
-            raise RequestTimeOut()
-    res = response.json()
+    res = await bazaar_client.post_json(url=url, body=json, operation="checkout", headers=headers)
     payment_url = res["payment_url"]
 
     # add params into url
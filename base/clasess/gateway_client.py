@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import time
+import weakref
+from dataclasses import dataclass
+
+import httpx
+from asgiref.sync import sync_to_async
+from decouple import config
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from apis.utils.custom_exceptions import RequestTimeOut, GatewayUnavailable
+
+# http2 needs the h2 package (pip install httpx[http2])
+GATEWAY_HTTP2 = config("GATEWAY_HTTP2", cast=bool, default=False)
+GATEWAY_MAX_CONNECTIONS = config("GATEWAY_MAX_CONNECTIONS", cast=int, default=50)
+GATEWAY_MAX_KEEPALIVE_CONNECTIONS = config("GATEWAY_MAX_KEEPALIVE_CONNECTIONS", cast=int, default=10)
+GATEWAY_KEEPALIVE_EXPIRY = config("GATEWAY_KEEPALIVE_EXPIRY", cast=float, default=30)
+
+GATEWAY_LATENCY_KEY = "gateway_latency:{gateway}:{operation}"
+# upper bounds of the latency histogram buckets in milliseconds, the last bucket is +inf
+LATENCY_BUCKETS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+OUTCOMES = ("ok", "error", "timeout", "open")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class GatewayPolicy:
+    name: str
+    timeout: float
+    connect_timeout: float = 3
+    retries: int = 2
+    # retries per request on average, an outage is not multiplied by the retries
+    retry_budget: float = 0.2
+    # consecutive failures that open the circuit, seconds before a probe request
+    failure_threshold: int = 5
+    reset_timeout: float = 30
+
+
+class CircuitBreaker:
+    """closed --> open after failure_threshold failures, one probe request after reset_timeout"""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        # half open
+        self.probing = True
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        # a failed probe opens the circuit again
+        if self.probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class RetryBudget:
+    """token bucket, every request deposits ratio tokens and every retry takes one"""
+
+    def __init__(self, ratio, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def record_latency(gateway, operation, outcome, elapsed_ms):
+    """metrics only, a redis error is logged and never reaches the payment"""
+    bucket = next((f"le_{bound}" for bound in LATENCY_BUCKETS if elapsed_ms <= bound), "le_inf")
+    pipe = get_redis_connection("default").pipeline()
+    key = GATEWAY_LATENCY_KEY.format(gateway=gateway, operation=operation)
+    pipe.hincrby(key, outcome, 1)
+    if outcome != "open":
+        pipe.hincrby(key, bucket, 1)
+        pipe.hincrby(key, "count", 1)
+        pipe.hincrbyfloat(key, "sum_ms", elapsed_ms)
+    try:
+        pipe.execute()
+    except RedisError:
+        logger.warning("gateway latency of %s:%s was not recorded", gateway, operation, exc_info=True)
+
+
+class GatewayClient:
+    """
+    process wide pooled client of one payment gateway,
+    connections are kept alive between requests of the same event loop
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_timeout)
+        self.budget = RetryBudget(policy.retry_budget)
+        self._clients = weakref.WeakKeyDictionary()
+        # running record_latency calls, kept so they are not garbage collected
+        self._records = set()
+
+    def _client(self):
+        # an httpx pool belongs to the loop that opened its connections,
+        # under asgi that is one loop per process, adrf on wsgi runs a loop per request
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=GATEWAY_HTTP2,
+                timeout=httpx.Timeout(self.policy.timeout, connect=self.policy.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=GATEWAY_MAX_CONNECTIONS,
+                    max_keepalive_connections=GATEWAY_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=GATEWAY_KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def _record(self, operation, outcome, elapsed_ms):
+        # not awaited, a slow redis does not hold the payment
+        task = asyncio.create_task(
+            sync_to_async(record_latency, thread_sensitive=False)(self.policy.name, operation, outcome, elapsed_ms)
+        )
+        self._records.add(task)
+        task.add_done_callback(self._records.discard)
+
+    async def post_json(self, url, body, operation, headers=None, idempotent=False):
+        """
+        json body of the response,
+        a request that is not idempotent is only retried when the connection was never made
+        """
+        if not self.breaker.allow():
+            await self._record(operation, "open", 0)
+            raise GatewayUnavailable()
+
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = await self._client().post(url, json=body, headers=headers)
+            except httpx.TransportError as error:
+                outcome = "timeout" if isinstance(error, httpx.TimeoutException) else "error"
+                retryable = idempotent or isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+            else:
+                outcome = "ok" if response.status_code < 500 else "error"
+                retryable = idempotent
+            await self._record(operation, outcome, (time.perf_counter() - start) * 1000)
+
+            if outcome == "ok":
+                self.breaker.success()
+                return response.json()
+
+            self.breaker.failure()
+            if attempt >= self.policy.retries or not retryable or not self.breaker.allow() or not self.budget.withdraw():
+                if outcome == "timeout":
+                    raise RequestTimeOut()
+                raise GatewayUnavailable()
+            attempt += 1
+            await asyncio.sleep(0.1 * 2 ** attempt)
+
+    async def aclose(self):
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+def get_gateway_latency_stats():
+    """{"zibal:verify": {"count", "avg_ms", "p50_ms", "p95_ms", "p99_ms", "ok", "error", "timeout", "open"}}"""
+    redis = get_redis_connection("default")
+    keys = sorted(redis.scan_iter(GATEWAY_LATENCY_KEY.format(gateway="*", operation="*")))
+    pipe = redis.pipeline()
+    for key in keys:
+        pipe.hgetall(key)
+
+    stats = {}
+    for key, values in zip(keys, pipe.execute()):
+        values = {name.decode(): float(value) for name, value in values.items()}
+        count = int(values.get("count", 0))
+        item = {outcome: int(values.get(outcome, 0)) for outcome in OUTCOMES}
+        item["count"] = count
+        item["avg_ms"] = values.get("sum_ms", 0) / count if count else 0
+        for quantile in (50, 95, 99):
+            item[f"p{quantile}_ms"] = _bucket_quantile(values, count, quantile / 100)
+        stats[key.decode().split(":", 1)[1]] = item
+    return stats
+
+
+def _bucket_quantile(values, count, quantile):
+    # upper bound of the bucket that holds the quantile, None for +inf
+    seen = 0
+    for bound in LATENCY_BUCKETS:
+        seen += values.get(f"le_{bound}", 0)
+        if count and seen >= quantile * count:
+            return bound
+    return None if count else 0
+
+
+def reset_gateway_latency_stats():
+    redis = get_redis_connection("default")
+    keys = list(redis.scan_iter(GATEWAY_LATENCY_KEY.format(gateway="*", operation="*")))
+    if keys:
+        redis.delete(*keys)
+
+
+zibal_client = GatewayClient(GatewayPolicy("zibal", timeout=config("ZIBAL_TIMEOUT", cast=float, default=10)))
+bazaar_client = GatewayClient(GatewayPolicy("bazaar", timeout=config("BAZAAR_TIMEOUT", cast=float, default=10)))
+GATEWAY_CLIENTS = (zibal_client, bazaar_client)
+
+
+async def close_gateway_clients():
+    for client in GATEWAY_CLIENTS:
+        await client.aclose()
@@ -0,0 +1,145 @@
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from decouple import config
+
+JUDGE_PYTHON_EXECUTABLE = config("JUDGE_PYTHON_EXECUTABLE", cast=str, default=sys.executable)
+# test cases run in one child process, one interpreter start per batch
+JUDGE_BATCH_SIZE = config("JUDGE_BATCH_SIZE", cast=int, default=20)
+JUDGE_OUTPUT_LIMIT = config("JUDGE_OUTPUT_LIMIT", cast=int, default=64 * 1024)
+# address space of the interpreter itself, added to the memory limit of the challenge
+JUDGE_MEMORY_OVERHEAD_MB = config("JUDGE_MEMORY_OVERHEAD_MB", cast=int, default=64)
+# RLIMIT_NPROC is not applied to root, a root worker drops the child to this user (nobody)
+JUDGE_UID = config("JUDGE_UID", cast=int, default=65534)
+JUDGE_GID = config("JUDGE_GID", cast=int, default=65534)
+# the child gets a network namespace of its own (only a loopback that is down), needs root or CAP_SYS_ADMIN.
+# the worker sits next to redis and postgres, only turn it off where submitted code can not reach them
+JUDGE_ISOLATE_NETWORK = config("JUDGE_ISOLATE_NETWORK", cast=bool, default=True)
+
+RUNNER = Path(__file__).with_name("judge_runner.py")
+
+
+@dataclass
+class JudgeResult:
+    status: str
+    execution_time: int = 0
+    test_results: list = field(default_factory=list)
+
+
+def normalize_output(output):
+    return "\n".join(line.rstrip() for line in output.strip().splitlines())
+
+
+class PythonJudge:
+    def __init__(self, time_limit, memory_limit):
+        # time_limit in milliseconds per test, memory_limit in megabytes
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+
+    def _set_limits(self, tests_count):
+        cpu_seconds = -(-self.time_limit * tests_count // 1000) + 1
+        memory = (self.memory_limit + JUDGE_MEMORY_OVERHEAD_MB) * 1024 * 1024
+
+        def set_limits():
+            os.setsid()
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+            resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+            resource.setrlimit(resource.RLIMIT_NOFILE, (16, 16))
+            resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+            if JUDGE_ISOLATE_NETWORK:
+                # fails the spawn instead of running the submission with network access
+                if os.getuid() == 0:
+                    os.unshare(os.CLONE_NEWNET)
+                else:
+                    os.unshare(os.CLONE_NEWUSER | os.CLONE_NEWNET)
+            if os.getuid() == 0:
+                os.setgroups([])
+                os.setgid(JUDGE_GID)
+                os.setuid(JUDGE_UID)
+            # after setuid, otherwise exec itself is refused
+            resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+        return set_limits
+
+    def _run_batch(self, source, inputs):
+        """raw results of the runner, a single failed result when the child process dies"""
+        request = json.dumps({
+            "source": source,
+            "inputs": inputs,
+            "time_limit": self.time_limit,
+            "output_limit": JUDGE_OUTPUT_LIMIT,
+        })
+        with tempfile.TemporaryDirectory(prefix="judge_") as work_dir:
+            process = subprocess.Popen(
+                (JUDGE_PYTHON_EXECUTABLE, "-I", "-S", str(RUNNER)),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=work_dir,
+                env={},
+                preexec_fn=self._set_limits(len(inputs)),
+            )
+            try:
+                stdout, _ = process.communicate(request.encode(), timeout=self.time_limit * len(inputs) / 1000 + 2)
+            except subprocess.TimeoutExpired:
+                self._kill(process)
+                process.communicate()
+                return [{"status": "time_limit_exceeded", "output": "", "time": self.time_limit}]
+            self._kill(process)
+
+        if process.returncode == -signal.SIGXCPU:
+            return [{"status": "time_limit_exceeded", "output": "", "time": self.time_limit}]
+        if process.returncode in (-signal.SIGKILL, -signal.SIGSEGV):
+            return [{"status": "memory_limit_exceeded", "output": "", "time": 0}]
+        try:
+            return json.loads(stdout)
+        except ValueError:
+            return [{"status": "runtime_error", "output": "", "time": 0}]
+
+    def _kill(self, process):
+        # whatever the submission left behind in its session
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def judge(self, source, test_cases):
+        """test_cases --> [(input_data, expected_output), ...] in order"""
+        try:
+            compile(source, "<submission>", "exec")
+        # deeply nested or huge expressions run the compiler out of stack or memory
+        except (SyntaxError, ValueError, MemoryError, RecursionError):
+            return JudgeResult(status="compilation_error")
+
+        test_results = []
+        for start in range(0, len(test_cases), JUDGE_BATCH_SIZE):
+            batch = test_cases[start:start + JUDGE_BATCH_SIZE]
+            results = self._run_batch(source, [input_data for input_data, _ in batch])
+
+            for result, (_, expected_output) in zip(results, batch):
+                status = result["status"]
+                if status == "ok":
+                    same = normalize_output(result["output"]) == normalize_output(expected_output)
+                    status = "accepted" if same else "wrong_answer"
+                test_results.append({"status": status, "time": result["time"]})
+
+                # the first failed test decides the result, the rest is not run
+                if status != "accepted":
+                    return JudgeResult(status, self._execution_time(test_results), test_results)
+
+            if len(results) < len(batch):
+                # the runner stopped early without reporting a failure
+                test_results.append({"status": "runtime_error", "time": 0})
+                return JudgeResult("runtime_error", self._execution_time(test_results), test_results)
+
+        return JudgeResult("accepted", self._execution_time(test_results), test_results)
+
+    def _execution_time(self, test_results):
+        return max((result["time"] for result in test_results), default=0)
@@ -0,0 +1,71 @@
+"""
+runs a batch of test cases inside the sandboxed child process of the judge, django is not loaded here.
+stdin  --> {"source": str, "inputs": [str, ...], "time_limit": ms, "output_limit": chars}
+stdout --> [{"status": str, "output": str, "time": ms}, ...], stops after the first failed test
+"""
+import io
+import json
+import os
+import signal
+import sys
+import time
+
+
+class TimeLimitExceeded(BaseException):
+    pass
+
+
+def _time_limit_exceeded(signum, frame):
+    raise TimeLimitExceeded()
+
+
+def main():
+    request = json.loads(sys.stdin.read())
+
+    # only the runner writes to the real stdout, the submission sees /dev/null
+    results_file = os.fdopen(os.dup(1), "w")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+
+    code = compile(request["source"], "<submission>", "exec")
+    signal.signal(signal.SIGALRM, _time_limit_exceeded)
+
+    results = []
+    for test_input in request["inputs"]:
+        output = io.StringIO()
+        sys.stdin, sys.stdout = io.StringIO(test_input), output
+        status = "ok"
+        start = time.perf_counter()
+        signal.setitimer(signal.ITIMER_REAL, request["time_limit"] / 1000)
+        try:
+            exec(code, {"__name__": "__main__", "__builtins__": __builtins__})
+        except TimeLimitExceeded:
+            status = "time_limit_exceeded"
+        except MemoryError:
+            status = "memory_limit_exceeded"
+        except SystemExit as error:
+            if error.code not in (None, 0):
+                status = "runtime_error"
+        except BaseException:
+            status = "runtime_error"
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
+
+        results.append({
+            "status": status,
+            "output": output.getvalue()[:request["output_limit"]],
+            "time": round((time.perf_counter() - start) * 1000),
+        })
+        if status != "ok":
+            break
+
+    json.dump(results, results_file)
+    results_file.flush()
+    # skip atexit handlers registered by the submission
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
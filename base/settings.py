@@ -383,3 +383,25 @@ CELERY_RESULT_SERIALIZER = config("CELERY_RESULT_SERIALIZER", cast=str, default=
 CELERY_TASK_ACKS_LATE = config("CELERY_TASK_ACKS_LATE", cast=bool, default=False)
 CELERY_WORKER_PREFETCH_MULTIPLIER = config("WORKER_PREFETCH_MULTIPLIER", cast=int, default=1)
 CELERY_TASK_ALWAYS_EAGER = config("CELERY_TASK_ALWAYS_EAGER", cast=bool, default=False)
+# judge runs on its own workers, one process per core (celery -Q judge -c <cores>)
+CELERY_TASK_ROUTES = {
+    "apps.challenge_app.tasks.judge_submission": {"queue": "judge"},
+}
+CELERY_BEAT_SCHEDULE = {
+    "flush_challenge_statistics": {
+        "task": "apps.challenge_app.tasks.flush_challenge_statistics",
+        "schedule": config("CHALLENGE_STATS_FLUSH_INTERVAL", cast=int, default=60),
+    },
+    "fail_stale_submissions": {
+        "task": "apps.challenge_app.tasks.fail_stale_submissions",
+        "schedule": config("JUDGE_STALE_CHECK_INTERVAL", cast=int, default=600),
+    },
+    "reconcile_payments": {
+        "task": "apps.gateway_app.tasks.reconcile_payments",
+        "schedule": config("PAYMENT_RECONCILE_INTERVAL", cast=int, default=300),
+    },
+    "expire_subscriptions": {
+        "task": "apps.subscription_app.tasks.expire_subscriptions",
+        "schedule": config("SUBSCRIPTION_EXPIRY_INTERVAL", cast=int, default=600),
+    },
+}
@@ -0,0 +1,151 @@
+from django.db import transaction
+from django.db.models import F, Q, Count, Avg, Value, FloatField, ExpressionWrapper
+from django_redis import get_redis_connection
+
+from apps.challenge_app.models import Challenge, ChallengeSubmission
+
+# counters of one challenge since the last flush
+CHALLENGE_STATS_KEY = "challenge_stats:{challenge_id}"
+# challenges with counters waiting for the flush
+CHALLENGE_STATS_DIRTY_KEY = "challenge_stats:dirty"
+CHALLENGE_STATS_FLUSH_BATCH = 1000
+STATS_FIELDS = ("total_submissions", "successful_submissions", "timed_submissions", "success_percent", "avg_completion_time")
+# pending and running submissions are counted when the judge finishes them, judge errors are not counted
+UNCOUNTED_STATUSES = ("pending", "running", "judge_error")
+
+
+def _add_counters(redis, challenge_id, counters):
+    pipe = redis.pipeline()
+    key = CHALLENGE_STATS_KEY.format(challenge_id=challenge_id)
+    for name, value in counters.items():
+        if value:
+            pipe.hincrby(key, name, value)
+    pipe.sadd(CHALLENGE_STATS_DIRTY_KEY, challenge_id)
+    pipe.execute()
+
+
+def add_submission(challenge_id, status, execution_time=None):
+    """count a finished submission, written to redis after the transaction commits"""
+    accepted = status == "accepted"
+    timed = accepted and execution_time is not None
+    counters = {
+        "total": 1,
+        "successful": 1 if accepted else 0,
+        "timed": 1 if timed else 0,
+        # milliseconds
+        "time_sum": execution_time if timed else 0,
+    }
+    transaction.on_commit(lambda: _add_counters(get_redis_connection("default"), challenge_id, counters))
+
+
+def _take_counters(redis, challenge_ids):
+    # read and delete in one MULTI, increments that arrive later start a new hash
+    pipe = redis.pipeline(transaction=True)
+    for challenge_id in challenge_ids:
+        key = CHALLENGE_STATS_KEY.format(challenge_id=int(challenge_id))
+        pipe.hgetall(key)
+        pipe.delete(key)
+        pipe.srem(CHALLENGE_STATS_DIRTY_KEY, challenge_id)
+    results = pipe.execute()
+
+    counters = {}
+    for challenge_id, values in zip(challenge_ids, results[::3]):
+        if values:
+            counters[int(challenge_id)] = {name.decode(): int(value) for name, value in values.items()}
+    return counters
+
+
+def pop_counters(batch_size=CHALLENGE_STATS_FLUSH_BATCH):
+    """{challenge_id: {"total", "successful", "timed", "time_sum"}}, removed from redis"""
+    redis = get_redis_connection("default")
+    challenge_ids = redis.spop(CHALLENGE_STATS_DIRTY_KEY, batch_size)
+    if not challenge_ids:
+        return {}
+    return _take_counters(redis, challenge_ids)
+
+
+def restore_counters(counters):
+    redis = get_redis_connection("default")
+    for challenge_id, values in counters.items():
+        _add_counters(redis, challenge_id, values)
+
+
+def _float(expression):
+    return ExpressionWrapper(expression, output_field=FloatField())
+
+
+def flush_counters(batch_size=CHALLENGE_STATS_FLUSH_BATCH):
+    """apply the redis counters of up to batch_size challenges with one UPDATE, returns the number of challenges"""
+    counters = pop_counters(batch_size)
+    if not counters:
+        return 0
+
+    challenges = []
+    for challenge_id, values in counters.items():
+        total, successful = values.get("total", 0), values.get("successful", 0)
+        timed, time_sum = values.get("timed", 0), values.get("time_sum", 0)
+
+        # the UPDATE reads the old row, new values are derived from the old ones plus the deltas
+        challenge = Challenge(
+            id=challenge_id,
+            total_submissions=F("total_submissions") + total,
+            successful_submissions=F("successful_submissions") + successful,
+            timed_submissions=F("timed_submissions") + timed,
+            success_percent=_float(
+                (F("successful_submissions") + successful) * 100.0 / (F("total_submissions") + total)
+            ) if total else F("success_percent"),
+            avg_completion_time=_float(
+                (F("avg_completion_time") * F("timed_submissions") + Value(time_sum / 1000))
+                / (F("timed_submissions") + timed)
+            ) if timed else F("avg_completion_time"),
+        )
+        challenges.append(challenge)
+
+    try:
+        Challenge.objects.bulk_update(challenges, STATS_FIELDS, batch_size=batch_size)
+    except Exception:
+        # counted again by the next flush
+        restore_counters(counters)
+        raise
+    return len(counters)
+
+
+def recompute_statistics(challenge_ids):
+    """rebuild the stats of the challenges from their submissions, one grouped query and one UPDATE"""
+    # taken before the rows are read, they belong to committed submissions the query counts.
+    # increments that arrive later stay in redis for the next flush
+    counters = _take_counters(get_redis_connection("default"), challenge_ids)
+    try:
+        return _recompute_statistics(challenge_ids)
+    except Exception:
+        restore_counters(counters)
+        raise
+
+
+def _recompute_statistics(challenge_ids):
+    accepted = Q(status="accepted")
+    rows = ChallengeSubmission.objects.filter(
+        challenge_id__in=challenge_ids, is_active=True
+    ).exclude(status__in=UNCOUNTED_STATUSES).values("challenge_id").annotate(
+        total=Count("id"),
+        successful=Count("id", filter=accepted),
+        timed=Count("id", filter=accepted & Q(execution_time__isnull=False)),
+        avg_time=Avg("execution_time", filter=accepted),
+    ).order_by()
+    stats = {row["challenge_id"]: row for row in rows}
+
+    challenges = []
+    for challenge_id in challenge_ids:
+        row = stats.get(challenge_id, {})
+        total, successful = row.get("total", 0), row.get("successful", 0)
+        challenges.append(Challenge(
+            id=challenge_id,
+            total_submissions=total,
+            successful_submissions=successful,
+            timed_submissions=row.get("timed", 0),
+            success_percent=successful * 100 / total if total else 0,
+            avg_completion_time=(row.get("avg_time") or 0) / 1000,
+        ))
+
+    Challenge.objects.bulk_update(challenges, STATS_FIELDS)
+    return len(challenges)
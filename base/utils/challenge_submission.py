@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from decouple import config
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.challenge_app.models import ChallengeSubmission, UserChallengeScore, TestCase, UserChallengeProgress
+from base.utils import leaderboard, challenge_stats
+from base.utils.solved_challenge_cache import solved_challenge_cache
+
+# languages with a server side judge
+JUDGE_LANGUAGES = ("PY",)
+FINISHED_STATUSES = ("accepted", "solved")
+JUDGE_STATUSES = ("pending", "running")
+# the judge failed, not the submission. no score, no counters, the user can submit again
+JUDGE_ERROR_STATUS = "judge_error"
+UNFINISHED_STATUSES = JUDGE_STATUSES + (JUDGE_ERROR_STATUS,)
+# minutes, longer than the time_limit of judge_submission and a busy judge queue
+JUDGE_STALE_AFTER = config("JUDGE_STALE_AFTER", cast=int, default=30)
+
+
+def lock_user_score(user_id):
+    """lock the score row of the user, submissions of the same user run one after another"""
+    user_score, _ = UserChallengeScore.objects.select_for_update().only(
+        "id", "total_score"
+    ).get_or_create(user_id=user_id)
+    return user_score
+
+
+def has_finished_submission(user_id, challenge_id):
+    return ChallengeSubmission.objects.filter(
+        is_active=True,
+        user_id=user_id,
+        challenge_id=challenge_id,
+        status__in=FINISHED_STATUSES
+    ).exists()
+
+
+def fail_stale_judge_submissions():
+    """
+    pending or running submissions the judge never finished (lost task, killed worker) --> judge_error,
+    otherwise JudgeInProgressException blocks the user on the challenge for good
+    """
+    stale_before = timezone.now() - timedelta(minutes=JUDGE_STALE_AFTER)
+    return ChallengeSubmission.objects.filter(
+        Q(status="pending", created_at__lt=stale_before) | Q(status="running", updated_at__lt=stale_before)
+    ).update(status=JUDGE_ERROR_STATUS, updated_at=timezone.now())
+
+
+def is_judged(challenge):
+    return challenge.language in JUDGE_LANGUAGES and TestCase.objects.filter(
+        challenge_id=challenge.id, is_active=True
+    ).exists()
+
+
+def record_submission_result(user, challenge, user_score, status, execution_time=None):
+    """
+    score ledger and challenge counters of a finished submission,
+    called inside the transaction that holds lock_user_score
+    """
+    score_change = {"accepted": challenge.points, "solved": -challenge.points}.get(status, 0)
+    if score_change:
+        UserChallengeScore.objects.filter(id=user_score.id).update(
+            total_score=F("total_score") + score_change
+        )
+        # the row is locked, so the new total is known without reading it back
+        leaderboard.set_user_score(user, user_score.total_score + score_change)
+
+    if status == "accepted":
+        solved_challenge_cache.add(user.id, challenge.id)
+
+    # challenge counters are flushed to the row by flush_challenge_statistics
+    challenge_stats.add_submission(challenge.id, status, execution_time)
+
+
+def upsert_challenge_progress(submission_id, user_id, challenge_id, status, score):
+    """one more attempt on the progress row of (user, challenge), created by the first submission"""
+    table = UserChallengeProgress._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} AS progress
+                (user_id, challenge_id, is_completed, best_score, attempts_count, completed_at,
+                 best_submission_id, is_active, created_at, updated_at)
+            VALUES (
+                %(user_id)s, %(challenge_id)s, %(completed)s, %(score)s, 1,
+                CASE WHEN %(completed)s THEN NOW() END, %(submission_id)s, TRUE, NOW(), NOW()
+            )
+            ON CONFLICT (user_id, challenge_id) DO UPDATE SET
+                attempts_count = progress.attempts_count + 1,
+                is_completed = progress.is_completed OR EXCLUDED.is_completed,
+                completed_at = COALESCE(progress.completed_at, EXCLUDED.completed_at),
+                best_submission_id = CASE
+                    WHEN progress.best_submission_id IS NULL OR EXCLUDED.best_score > progress.best_score
+                    THEN EXCLUDED.best_submission_id ELSE progress.best_submission_id
+                END,
+                best_score = GREATEST(progress.best_score, EXCLUDED.best_score),
+                updated_at = EXCLUDED.updated_at
+            """,
+            {
+                "submission_id": submission_id,
+                "user_id": user_id,
+                "challenge_id": challenge_id,
+                "completed": status == "accepted",
+                "score": score,
+            },
+        )
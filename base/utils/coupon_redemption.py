@@ -0,0 +1,59 @@
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from apps.discount_app.models import Coupon
+from apps.gateway_app.models import Gateway
+
+
+def reserve_coupon(code):
+    """
+    takes one use of a valid coupon in a single conditional UPDATE, returns the coupon or None.
+    the row lock is held only for this statement, not for the gateway request
+    """
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {Coupon._meta.db_table}
+            SET number_of_uses = number_of_uses + 1, updated_at = NOW()
+            WHERE code = %s AND is_active AND valid_from <= %s AND valid_to > %s
+                AND number_of_uses < maximum_use
+            RETURNING id, coupon_type, amount
+            """,
+            [code, now, now],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return Coupon(id=row[0], code=code, coupon_type=row[1], amount=row[2])
+
+
+def release_coupon(coupon_id):
+    """gives back a use that was reserved before a gateway record exists"""
+    Coupon.objects.filter(id=coupon_id, number_of_uses__gt=0).update(number_of_uses=F("number_of_uses") - 1)
+
+
+def release_gateway_coupons(*gateway_ids):
+    """
+    gives back the coupon uses of failed payments, clearing gateway.coupon first
+    so a payment that is released twice (verify and reconciliation) gives back one use
+    """
+    if not gateway_ids:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH released AS (
+                UPDATE {Gateway._meta.db_table} SET coupon_id = NULL
+                WHERE id = ANY(%s) AND coupon_id IS NOT NULL AND NOT is_complete
+                RETURNING coupon_id
+            )
+            UPDATE {Coupon._meta.db_table} coupon
+            SET number_of_uses = GREATEST(coupon.number_of_uses - released_count.uses, 0), updated_at = NOW()
+            FROM (SELECT coupon_id, COUNT(*) AS uses FROM released GROUP BY coupon_id) released_count
+            WHERE coupon.id = released_count.coupon_id
+            """,
+            [list(gateway_ids)],
+        )
+        return cursor.rowcount
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+from apis.utils.custom_cache import bump_catalog_tags, get_catalog_tag_versions
+from apps.subscription_app.models import UserSubscription
+
+# bumped after every subscription write of the user, an entry filled from rows read
+# before the bump is stored under the old version and never read
+ENTITLEMENT_TAG = "entitlement:{user_id}"
+ENTITLEMENT_KEY = "entitlement:{user_id}:{version}"
+# users without any upcoming subscription, short so a missed invalidation does not lock out a paying user
+ENTITLEMENT_EMPTY_TIMEOUT = 60 * 10
+# upper limit for users with a subscription, the entry otherwise lives until the next end_date/start_date
+ENTITLEMENT_MAX_TIMEOUT = 60 * 60 * 24
+
+
+def _load_entitlements(user_id):
+    """({plan_id: end timestamp}, seconds until the entry is stale)"""
+    now = timezone.now()
+    subscriptions = UserSubscription.objects.filter(
+        user_id=user_id,
+        is_active=True,
+        status="active",
+        end_date__gte=now,
+    ).values_list("plan_id", "start_date", "end_date")
+
+    plans = {}
+    # the entry changes when a subscription ends or a future one starts
+    changes_at = []
+    for plan_id, start_date, end_date in subscriptions:
+        if start_date <= now:
+            plans[str(plan_id)] = max(plans.get(str(plan_id), 0), int(end_date.timestamp()))
+            changes_at.append(end_date)
+        else:
+            changes_at.append(start_date)
+
+    if not changes_at:
+        return plans, ENTITLEMENT_EMPTY_TIMEOUT
+    return plans, max(1, min(int((min(changes_at) - now).total_seconds()), ENTITLEMENT_MAX_TIMEOUT))
+
+
+def get_entitlements(user_id):
+    """{plan_id: end timestamp} of the subscriptions the user has right now"""
+    version = get_catalog_tag_versions((ENTITLEMENT_TAG.format(user_id=user_id),))
+    key = ENTITLEMENT_KEY.format(user_id=user_id, version=version)
+    plans = cache.get(key)
+    if plans is None:
+        plans, timeout = _load_entitlements(user_id)
+        cache.add(key, plans, timeout=timeout)
+    return {int(plan_id): end for plan_id, end in plans.items()}
+
+
+def has_active_subscription(user_id, plan_id=None):
+    entitlements = get_entitlements(user_id)
+    if plan_id is None:
+        return bool(entitlements)
+    return plan_id in entitlements
+
+
+def invalidate_entitlements(*user_ids):
+    # after the transaction commits
+    bump_catalog_tags(*[ENTITLEMENT_TAG.format(user_id=user_id) for user_id in user_ids])
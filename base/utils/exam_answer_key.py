@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from apis.utils.custom_cache import bump_catalog_tags, get_catalog_tag_versions
+from apps.exam_app.models import Question, Choice
+
+# bumped after every question/choice write of the exam, a fill from rows read
+# before the bump is stored under the old version and never read
+EXAM_ANSWER_KEY_TAG = "exam_answer_key:{exam_id}"
+EXAM_ANSWER_KEY = "exam_answer_key:{exam_id}:{version}"
+EXAM_ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+
+
+def _load_exam_answer_key(exam_id):
+    questions = Question.objects.filter(
+        exam_id=exam_id, is_active=True
+    ).only("id", "question_type", "score").prefetch_related(
+        Prefetch(
+            "choices",
+            queryset=Choice.objects.filter(is_active=True).only("id", "question_id", "is_correct")
+        )
+    )
+    # msgpack only accepts str keys in maps
+    return {
+        str(question.id): {
+            "question_type": question.question_type,
+            "score": question.score,
+            "choices": [choice.id for choice in question.choices.all()],
+            "correct_choices": [choice.id for choice in question.choices.all() if choice.is_correct],
+        }
+        for question in questions
+    }
+
+
+def get_exam_answer_key(exam_id):
+    """active questions of the exam --> type, score, active choices and correct choices"""
+    version = get_catalog_tag_versions((EXAM_ANSWER_KEY_TAG.format(exam_id=exam_id),))
+    key = EXAM_ANSWER_KEY.format(exam_id=exam_id, version=version)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = _load_exam_answer_key(exam_id)
+        cache.add(key, answer_key, timeout=EXAM_ANSWER_KEY_TIMEOUT)
+    return answer_key
+
+
+def invalidate_exam_answer_key(exam_id):
+    # after the transaction commits
+    bump_catalog_tags(EXAM_ANSWER_KEY_TAG.format(exam_id=exam_id))
@@ -1,46 +1,99 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
 from apps.course_app.models import LessonCourse, StudentAccessSection, Section
 from apps.auth_app.models import Student
+from base.utils.section_access_cache import section_access_cache
+
+STARTER_SECTIONS_PER_COURSE = 2
+STARTER_CATALOG_VERSION_KEY = "starter_sections:version"
+STARTER_SECTIONS_KEY = "starter_sections:{version}"
+STARTER_GRANTED_KEY = "starter_sections:granted:{user_id}"
+
+
+def get_starter_catalog_version():
+    version = cache.get(STARTER_CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(STARTER_CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(STARTER_CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_starter_catalog_version():
+    """
+    called when Section or LessonCourse rows change, bumps after the transaction commits.
+    a bump inside the transaction lets a login cache the old starter set under the new version
+    """
+    def bump():
+        if not cache.add(STARTER_CATALOG_VERSION_KEY, 1, timeout=None):
+            cache.incr(STARTER_CATALOG_VERSION_KEY)
+
+    transaction.on_commit(bump)
+
+
+def get_starter_section_ids(version):
+    """first two active sections of every course that has an active lesson course"""
+    key = STARTER_SECTIONS_KEY.format(version=version)
+    section_ids = cache.get(key)
+    if section_ids is None:
+        section_ids = list(
+            Section.objects.filter(
+                is_active=True,
+                course_id__in=LessonCourse.objects.filter(is_active=True).values("course_id"),
+            ).annotate(
+                position=Window(RowNumber(), partition_by=F("course_id"), order_by=F("id").asc())
+            ).filter(
+                position__lte=STARTER_SECTIONS_PER_COURSE
+            ).values_list("id", flat=True)
+        )
+        cache.set(key, section_ids)
+    return section_ids
+
+
+def _insert_student_access_sections(user_id, section_ids):
+    # one statement: resolve the student and insert the missing rows,
+    # existing rows are left alone, an access the admin revoked stays revoked.
+    # returns (student found, inserted section ids)
+    access_table = StudentAccessSection._meta.db_table
+    student_table = Student._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH student AS (
+                SELECT id FROM {student_table} WHERE user_id = %s
+            ), inserted AS (
+                INSERT INTO {access_table}
+                    (student_id, section_id, is_access, is_active, created_at, updated_at)
+                SELECT student.id, section_ids.id, TRUE, TRUE, NOW(), NOW()
+                FROM student
+                CROSS JOIN UNNEST(%s::bigint[]) AS section_ids(id)
+                ON CONFLICT (student_id, section_id) DO NOTHING
+                RETURNING section_id
+            )
+            SELECT EXISTS (SELECT 1 FROM student), ARRAY(SELECT section_id FROM inserted)
+            """,
+            [user_id, list(section_ids)],
+        )
+        return cursor.fetchone()
 
 
 def grant_mobile_sections_access(user_id):
-    student = Student.objects.only("id").filter(id=user_id).first()
-    if not student:
+    version = get_starter_catalog_version()
+    granted_key = STARTER_GRANTED_KEY.format(user_id=user_id)
+
+    # already granted for this catalog version
+    if cache.get(granted_key) == version:
         return
 
-    course_ids = list(
-        LessonCourse.objects.only("course_id")
-        .filter(is_active=True)
-        .values_list("course_id", flat=True)
-    )
-
-    sections = list(
-        Section.objects.only("course_id")
-        .filter(course_id__in=course_ids, is_active=True)
-        .order_by("course_id", "id")
-    )
-
-    selected_section_ids = []
-    last_course_id = None
-    count = 0
-
-    for s in sections:
-        if s.course_id != last_course_id:
-            last_course_id = s.course_id
-            count = 0
-        if count < 2:
-            selected_section_ids.append(s.id)
-            count += 1
-
-    access_objects = [
-        StudentAccessSection(
-            student=student,
-            section_id=section_id,
-            is_access=True
-        )
-        for section_id in selected_section_ids
-    ]
+    section_ids = get_starter_section_ids(version)
+    if not section_ids:
+        return
 
-    StudentAccessSection.objects.bulk_create(
-        access_objects,
-        ignore_conflicts=True
-    )
+    found, granted_ids = _insert_student_access_sections(user_id, section_ids)
+    # no student row yet, the next login grants again
+    if not found:
+        return
+    section_access_cache.add(user_id, *granted_ids)
+    cache.set(granted_key, version)
@@ -0,0 +1,88 @@
+import ast
+import hashlib
+import time
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from apis.utils.custom_cache import get_catalog_tag_versions
+
+# bumped by TestCase and Challenge signals
+JUDGE_TEST_SET_TAG = "judge_test_set:{challenge_id}"
+JUDGE_RESULT_KEY = "judge_result:{challenge_id}:{version}:{language}:{source_hash}"
+JUDGE_RESULT_LRU_KEY = "judge_result:lru"
+JUDGE_RESULT_STATS_KEY = "judge_result:stats"
+JUDGE_RESULT_MAX_ENTRIES = 50000
+# time and memory limit results depend on the load of the worker, they are judged again
+CACHED_STATUSES = ("accepted", "wrong_answer", "runtime_error", "compilation_error")
+
+
+def normalized_source_hash(language, source):
+    """same hash for sources that only differ in comments, blank lines and formatting"""
+    normalized = None
+    if language == "PY":
+        try:
+            normalized = ast.dump(ast.parse(source))
+        except (SyntaxError, ValueError, MemoryError, RecursionError):
+            # not valid python or too deeply nested for the parser, the raw source is hashed
+            pass
+    if normalized is None:
+        normalized = "\n".join(line.rstrip() for line in source.strip().splitlines() if line.strip())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def judge_result_key(challenge, source_code):
+    return JUDGE_RESULT_KEY.format(
+        challenge_id=challenge.id,
+        version=get_catalog_tag_versions((JUDGE_TEST_SET_TAG.format(challenge_id=challenge.id),)),
+        language=challenge.language,
+        source_hash=normalized_source_hash(challenge.language, source_code),
+    )
+
+
+def get_judge_result(key):
+    """{"status", "execution_time", "test_results"} or None, counts hits and misses"""
+    result = cache.get(key)
+
+    pipe = get_redis_connection("default").pipeline()
+    if result is None:
+        pipe.hincrby(JUDGE_RESULT_STATS_KEY, "misses", 1)
+    else:
+        pipe.hincrby(JUDGE_RESULT_STATS_KEY, "hits", 1)
+        pipe.zadd(JUDGE_RESULT_LRU_KEY, {key: time.time()})
+    pipe.execute()
+    return result
+
+
+def set_judge_result(key, result):
+    if result["status"] not in CACHED_STATUSES:
+        return
+
+    cache.set(key, result, timeout=None)
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline()
+    pipe.zadd(JUDGE_RESULT_LRU_KEY, {key: time.time()})
+    pipe.zcard(JUDGE_RESULT_LRU_KEY)
+    _, size = pipe.execute()
+
+    # least recently used results go first
+    if size > JUDGE_RESULT_MAX_ENTRIES:
+        evicted = redis.zpopmin(JUDGE_RESULT_LRU_KEY, size - JUDGE_RESULT_MAX_ENTRIES)
+        cache.delete_many([member.decode() for member, _ in evicted])
+
+
+def get_judge_cache_stats():
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline()
+    pipe.hgetall(JUDGE_RESULT_STATS_KEY)
+    pipe.zcard(JUDGE_RESULT_LRU_KEY)
+    stats, size = pipe.execute()
+    return {
+        "hits": int(stats.get(b"hits", 0)),
+        "misses": int(stats.get(b"misses", 0)),
+        "size": size,
+    }
+
+
+def reset_judge_cache_stats():
+    get_redis_connection("default").delete(JUDGE_RESULT_STATS_KEY)
@@ -0,0 +1,110 @@
+import hashlib
+
+from django.db import transaction
+from django_redis import get_redis_connection
+
+BOARDS = ("global", "state", "city", "school")
+LEADERBOARD_KEY = "leaderboard:{board}"
+LEADERBOARD_MEMBERSHIP_KEY = "leaderboard:membership"
+
+
+def school_board(school):
+    # school is free text, keep the key short and stable
+    normalized = " ".join(school.split()).lower()
+    return f"school:{hashlib.md5(normalized.encode()).hexdigest()[:16]}"
+
+
+def user_boards(state_id, city_id, school):
+    """boards of a user, global first"""
+    boards = ["global"]
+    if state_id:
+        boards.append(f"state:{state_id}")
+    if city_id:
+        boards.append(f"city:{city_id}")
+    if school and school.strip():
+        boards.append(school_board(school))
+    return boards
+
+
+def board_of_user(user, board):
+    """board name of the user for one of BOARDS, None when the user has no value for it"""
+    if board == "global":
+        return "global"
+    boards = user_boards(user.state_id, user.city_id, user.school)
+    return next((name for name in boards if name.startswith(f"{board}:")), None)
+
+
+def _set_user_score(user_id, boards, total_score):
+    redis = get_redis_connection("default")
+    membership = redis.hget(LEADERBOARD_MEMBERSHIP_KEY, user_id)
+    old_boards = membership.decode().split("|") if membership else []
+
+    pipe = redis.pipeline()
+    for board in set(old_boards) - set(boards):
+        pipe.zrem(LEADERBOARD_KEY.format(board=board), user_id)
+    for board in boards:
+        pipe.zadd(LEADERBOARD_KEY.format(board=board), {user_id: total_score})
+    pipe.hset(LEADERBOARD_MEMBERSHIP_KEY, user_id, "|".join(boards))
+    pipe.execute()
+
+
+def set_user_score(user, total_score):
+    """mirror the new total score of the user after the current transaction commits"""
+    boards = user_boards(user.state_id, user.city_id, user.school)
+    transaction.on_commit(lambda: _set_user_score(user.id, boards, total_score))
+
+
+def move_user_boards(user):
+    """state, city or school of the user changed"""
+    def _move():
+        total_score = get_redis_connection("default").zscore(LEADERBOARD_KEY.format(board="global"), user.id)
+        if total_score is not None:
+            _set_user_score(user.id, user_boards(user.state_id, user.city_id, user.school), total_score)
+
+    transaction.on_commit(_move)
+
+
+def remove_user(user_id):
+    def _remove():
+        redis = get_redis_connection("default")
+        membership = redis.hget(LEADERBOARD_MEMBERSHIP_KEY, user_id)
+        pipe = redis.pipeline()
+        for board in membership.decode().split("|") if membership else ["global"]:
+            pipe.zrem(LEADERBOARD_KEY.format(board=board), user_id)
+        pipe.hdel(LEADERBOARD_MEMBERSHIP_KEY, user_id)
+        pipe.execute()
+
+    transaction.on_commit(_remove)
+
+
+def get_top(board, limit):
+    """[(rank, user_id, total_score), ...]"""
+    members = get_redis_connection("default").zrevrange(
+        LEADERBOARD_KEY.format(board=board), 0, limit - 1, withscores=True
+    )
+    return [(rank, int(user_id), score) for rank, (user_id, score) in enumerate(members, start=1)]
+
+
+def get_rank(board, user_id):
+    """(rank, total_score) of the user, (None, None) when the user is not on the board"""
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline()
+    pipe.zrevrank(LEADERBOARD_KEY.format(board=board), user_id)
+    pipe.zscore(LEADERBOARD_KEY.format(board=board), user_id)
+    rank, total_score = pipe.execute()
+    if rank is None:
+        return None, None
+    return rank + 1, total_score
+
+
+def get_around(board, user_id, radius):
+    """users ranked right above and below the user, the user included"""
+    redis = get_redis_connection("default")
+    key = LEADERBOARD_KEY.format(board=board)
+    rank = redis.zrevrank(key, user_id)
+    if rank is None:
+        return []
+
+    start = max(rank - radius, 0)
+    members = redis.zrevrange(key, start, rank + radius, withscores=True)
+    return [(position, int(member), score) for position, (member, score) in enumerate(members, start=start + 1)]
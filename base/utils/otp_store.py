@@ -0,0 +1,69 @@
+import hashlib
+import hmac
+import secrets
+import time
+
+from decouple import config
+from django.conf import settings
+from django_redis import get_redis_connection
+
+OTP_KEY = "otp:{phone}"
+# seconds
+OTP_TIMEOUT = config("OTP_TIMEOUT", cast=int, default=120)
+# wrong codes before the record is dropped and a new code has to be requested
+OTP_MAX_ATTEMPTS = config("OTP_MAX_ATTEMPTS", cast=int, default=5)
+OTP_LENGTH = 6
+
+OTP_VERIFIED = 1
+OTP_INVALID = 0
+OTP_EXPIRED = -1
+
+# KEYS[1] record, ARGV digest, max attempts, now
+# checks, counts and deletes in one step, two requests can not use the same code or share an attempt
+VERIFY_OTP_SCRIPT = """
+local record = redis.call('HMGET', KEYS[1], 'digest', 'expires_at')
+if not record[1] or tonumber(record[2]) <= tonumber(ARGV[3]) then
+    redis.call('DEL', KEYS[1])
+    return -1
+end
+if record[1] == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_verify_script = None
+
+
+def _digest(phone, code):
+    # the code is never stored, a dump of redis does not give out valid codes
+    return hmac.new(settings.SECRET_KEY.encode(), f"{phone}:{code}".encode(), hashlib.sha256).hexdigest()
+
+
+def issue_otp(phone):
+    """new code for the phone, replaces the previous one and its attempts. returns (code, expire timestamp)"""
+    code = "".join(str(secrets.randbelow(10)) for _ in range(OTP_LENGTH))
+    expires_at = int(time.time()) + OTP_TIMEOUT
+    key = OTP_KEY.format(phone=phone)
+
+    pipe = get_redis_connection("default").pipeline()
+    pipe.delete(key)
+    pipe.hset(key, mapping={"digest": _digest(phone, code), "attempts": 0, "expires_at": expires_at})
+    pipe.expire(key, OTP_TIMEOUT)
+    pipe.execute()
+    return code, expires_at
+
+
+def verify_otp(phone, code):
+    """OTP_VERIFIED (the code is consumed), OTP_INVALID or OTP_EXPIRED (no code, expired or too many attempts)"""
+    global _verify_script
+    if _verify_script is None:
+        _verify_script = get_redis_connection("default").register_script(VERIFY_OTP_SCRIPT)
+    return _verify_script(
+        keys=[OTP_KEY.format(phone=phone)],
+        args=[_digest(phone, code), OTP_MAX_ATTEMPTS, int(time.time())],
+    )
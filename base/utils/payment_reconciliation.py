@@ -0,0 +1,168 @@
+import asyncio
+from datetime import timedelta
+
+from decouple import config
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import APIException
+
+from apps.gateway_app.models import Gateway as GatewayModel, ResultGateway
+from apps.subscription_app.models import UserSubscription
+from base.clasess.gateway import Gateway
+from base.clasess.gateway_client import close_gateway_clients
+from base.utils.coupon_redemption import release_gateway_coupons
+from base.utils.entitlement_cache import invalidate_entitlements
+from base.utils.payment_status import publish_payment_status, PAID, FAILED
+
+# minutes, the client gets the first chance to call VerifyPayment
+RECONCILE_MIN_AGE = config("PAYMENT_RECONCILE_MIN_AGE", cast=int, default=5)
+# minutes, a payment that is still waiting after this is given up and its subscription expires
+RECONCILE_MAX_AGE = config("PAYMENT_RECONCILE_MAX_AGE", cast=int, default=24 * 60)
+RECONCILE_BATCH_SIZE = config("PAYMENT_RECONCILE_BATCH_SIZE", cast=int, default=200)
+# verify requests in flight at the same time
+RECONCILE_CONCURRENCY = config("PAYMENT_RECONCILE_CONCURRENCY", cast=int, default=10)
+
+# zibal verify result, 100 verified now, 201 verified before
+PAID_RESULTS = (100, 201)
+# 202 not paid, 203 invalid track id
+FAILED_RESULTS = (202, 203)
+# zibal payment status, -1 waiting for the bank, -2 internal error of the gateway
+WAITING_STATUSES = (-1, -2)
+
+
+async def _verify_all(track_ids):
+    semaphore = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+    gateway = Gateway()
+
+    async def verify(track_id):
+        async with semaphore:
+            try:
+                return await gateway.verify_payment(int(track_id))
+            except (APIException, ValueError):
+                # timeout, open circuit or a broken response, checked again by the next run
+                return None
+
+    try:
+        return await asyncio.gather(*(verify(track_id) for track_id in track_ids))
+    finally:
+        await close_gateway_clients()
+
+
+def _outcome(result, expired):
+    """paid, failed or None while the payment may still complete"""
+    if result is not None:
+        if result.get("result") in PAID_RESULTS:
+            return "paid"
+        if result.get("result") in FAILED_RESULTS and result.get("status") not in WAITING_STATUSES:
+            return "failed"
+    return "failed" if expired else None
+
+
+def result_gateway_row(gateway, result):
+    paid_at = parse_datetime(result.get("paidAt") or "") or timezone.now()
+    if timezone.is_naive(paid_at):
+        paid_at = timezone.make_aware(paid_at)
+    return ResultGateway(
+        gateway_id=gateway.id,
+        paid_at=paid_at,
+        amount=result.get("amount") or 0,
+        result=result.get("result") or 0,
+        status=max(result.get("status") or 0, 0),
+        ref_number=str(result.get("refNumber") or "")[:20],
+        description=(result.get("description") or "")[:255],
+        card_number=(result.get("cardNumber") or "")[:20],
+        order_id=str(result.get("orderId") or "")[:20],
+        message=(result.get("message") or "")[:255],
+    )
+
+
+def record_failed_payment(gateway, result, subscription_id):
+    """
+    a payment VerifyPayment found failed, written like reconciliation writes it.
+    the result row takes the payment out of the pending set and tells load_payment_status it failed
+    """
+    with transaction.atomic():
+        result_gateway_row(gateway, result).save()
+        release_gateway_coupons(gateway.id)
+        UserSubscription.objects.filter(id=subscription_id, status="reserve").update(status="expired")
+        publish_payment_status(FAILED, gateway.id)
+
+
+def _reserved_subscriptions(gateways):
+    """reserved subscription of every gateway, created right after the gateway row by GatewayView"""
+    candidates = UserSubscription.objects.filter(
+        user_id__in={gateway.user_id for gateway in gateways},
+        plan_id__in={gateway.subscription_id for gateway in gateways},
+        status="reserve",
+        is_active=True,
+    ).only("id", "user_id", "plan_id", "created_at").order_by("id")
+
+    taken = set()
+    subscriptions = {}
+    for gateway in sorted(gateways, key=lambda item: item.id):
+        for subscription in candidates:
+            if (
+                subscription.id not in taken
+                and subscription.user_id == gateway.user_id
+                and subscription.plan_id == gateway.subscription_id
+                and subscription.created_at >= gateway.created_at
+            ):
+                taken.add(subscription.id)
+                subscriptions[gateway.id] = subscription.id
+                break
+    return subscriptions
+
+
+def reconcile_batch(after_id=0):
+    """verify one batch of pending zibal payments, returns (gateways checked, last gateway id, paid, failed)"""
+    now = timezone.now()
+    gateways = list(
+        GatewayModel.objects.filter(
+            id__gt=after_id,
+            gateway_name="zibal",
+            is_complete=False,
+            is_active=True,
+            track_id__isnull=False,
+            created_at__lte=now - timedelta(minutes=RECONCILE_MIN_AGE),
+        ).exclude(
+            Exists(ResultGateway.objects.filter(gateway_id=OuterRef("pk")))
+        ).only("id", "user_id", "subscription_id", "track_id", "created_at").order_by("id")[:RECONCILE_BATCH_SIZE]
+    )
+    if not gateways:
+        return 0, after_id, 0, 0
+
+    results = asyncio.run(_verify_all([gateway.track_id for gateway in gateways]))
+
+    expire_before = now - timedelta(minutes=RECONCILE_MAX_AGE)
+    paid, failed, result_rows = [], [], []
+    for gateway, result in zip(gateways, results):
+        outcome = _outcome(result, gateway.created_at < expire_before)
+        if outcome is None:
+            continue
+        (paid if outcome == "paid" else failed).append(gateway)
+        # a given up payment is recorded too, so it leaves the pending set
+        result_rows.append(result_gateway_row(gateway, result or {"message": "expired without a gateway response"}))
+
+    if paid or failed:
+        subscriptions = _reserved_subscriptions(paid + failed)
+        with transaction.atomic():
+            ResultGateway.objects.bulk_create(result_rows)
+            GatewayModel.objects.filter(id__in=[gateway.id for gateway in paid]).update(is_complete=True)
+            release_gateway_coupons(*[gateway.id for gateway in failed])
+            # the client may have verified the same payment meanwhile, only reserved rows change
+            UserSubscription.objects.filter(
+                id__in=[subscriptions[gateway.id] for gateway in paid if gateway.id in subscriptions],
+                status="reserve",
+            ).update(status="active")
+            UserSubscription.objects.filter(
+                id__in=[subscriptions[gateway.id] for gateway in failed if gateway.id in subscriptions],
+                status="reserve",
+            ).update(status="expired")
+            # bulk updates do not send post_save
+            invalidate_entitlements(*{gateway.user_id for gateway in paid + failed})
+            publish_payment_status(PAID, *[gateway.id for gateway in paid])
+            publish_payment_status(FAILED, *[gateway.id for gateway in failed])
+
+    return len(gateways), gateways[-1].id, len(paid), len(failed)
@@ -0,0 +1,142 @@
+import asyncio
+import weakref
+
+from decouple import config
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django_redis import get_redis_connection
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from apps.gateway_app.models import Gateway as GatewayModel, ResultGateway
+
+PAYMENT_STATUS_CHANNEL = "payment_status:{gateway_id}"
+PAID = "paid"
+FAILED = "failed"
+PENDING = "pending"
+# seconds, below the timeout of the proxy in front of the asgi server
+PAYMENT_STATUS_MAX_WAIT = config("PAYMENT_STATUS_MAX_WAIT", cast=int, default=55)
+
+
+def publish_payment_status(status, *gateway_ids):
+    """tells the waiting status requests that the payments finished, after the transaction commits"""
+    channels = [PAYMENT_STATUS_CHANNEL.format(gateway_id=gateway_id) for gateway_id in gateway_ids]
+    if not channels:
+        return
+
+    def publish():
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        for channel in channels:
+            pipe.publish(channel, status)
+        pipe.execute()
+
+    transaction.on_commit(publish)
+
+
+async def load_payment_status(gateway_id):
+    """paid, failed (a result row without is_complete, written by VerifyPayment or reconciliation) or pending"""
+    row = await GatewayModel.objects.filter(id=gateway_id).annotate(
+        has_result=Exists(ResultGateway.objects.filter(gateway_id=OuterRef("pk")))
+    ).values_list("is_complete", "has_result").afirst()
+    if row is None:
+        return PENDING
+    is_complete, has_result = row
+    if is_complete:
+        return PAID
+    return FAILED if has_result else PENDING
+
+
+class PaymentStatusListener:
+    """
+    one pub/sub connection per event loop, shared by every request that waits on a payment.
+    a channel is subscribed while at least one request waits on it
+    """
+
+    def __init__(self):
+        self.redis = Redis.from_url(settings.CACHES["default"]["LOCATION"])
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.waiters = {}
+        self.task = None
+        # the first subscribe opens the connection, concurrent ones would open more
+        self.lock = asyncio.Lock()
+
+    async def _listen(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except RedisError:
+                # the waiters read the database instead, the connection is opened again by the next subscribe
+                self._wake_all(None)
+                await asyncio.sleep(1)
+                continue
+            if message is None:
+                continue
+            for future in self.waiters.get(message["channel"].decode(), ()):
+                if not future.done():
+                    future.set_result(message["data"].decode())
+
+    def _wake_all(self, status):
+        for futures in self.waiters.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(status)
+
+    async def wait(self, gateway_id, timeout):
+        """status of the payment, waits up to timeout seconds while it is pending"""
+        channel = PAYMENT_STATUS_CHANNEL.format(gateway_id=gateway_id)
+        future = asyncio.get_running_loop().create_future()
+        futures = self.waiters.setdefault(channel, set())
+        futures.add(future)
+        try:
+            if len(futures) == 1:
+                async with self.lock:
+                    await self.pubsub.subscribe(channel)
+            if self.task is None or self.task.done():
+                self.task = asyncio.create_task(self._listen())
+
+            # subscribed first, a payment that finished before that is in the database
+            status = await load_payment_status(gateway_id)
+            if status != PENDING:
+                return status
+            try:
+                status = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                return PENDING
+            return status or await load_payment_status(gateway_id)
+        finally:
+            futures.discard(future)
+            if not futures:
+                self.waiters.pop(channel, None)
+                try:
+                    async with self.lock:
+                        await self.pubsub.unsubscribe(channel)
+                except RedisError:
+                    pass
+
+    async def aclose(self):
+        if self.task is not None:
+            self.task.cancel()
+        await self.pubsub.aclose()
+        await self.redis.aclose()
+
+
+_listeners = weakref.WeakKeyDictionary()
+
+
+def _listener():
+    loop = asyncio.get_running_loop()
+    listener = _listeners.get(loop)
+    if listener is None:
+        listener = _listeners[loop] = PaymentStatusListener()
+    return listener
+
+
+async def wait_for_payment_status(gateway_id, timeout=PAYMENT_STATUS_MAX_WAIT):
+    return await _listener().wait(gateway_id, min(timeout, PAYMENT_STATUS_MAX_WAIT))
+
+
+async def close_payment_status_listener():
+    listener = _listeners.pop(asyncio.get_running_loop(), None)
+    if listener is not None:
+        await listener.aclose()
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from apis.utils.custom_cache import bump_catalog_tags, get_catalog_tag_versions
+
+# always stored with a filled set, 0 is never a primary key
+FILLED_MARKER = 0
+
+
+class UserIdSetCache:
+    """
+    per user set of ids in redis, filled lazily from the database.
+    writers only add to the set, so a concurrent fill never loses a newer id.
+    invalidate bumps a per user version, a fill from rows read before the bump lands in the old set
+    """
+
+    def __init__(self, prefix, loader, timeout=60 * 60 * 24):
+        self.prefix = prefix
+        self.loader = loader
+        self.timeout = timeout
+
+    def _tag(self, user_id):
+        return f"{self.prefix}:{user_id}"
+
+    def _key(self, user_id):
+        # the version is read before the database, the fill goes to the set of that version
+        version = get_catalog_tag_versions((self._tag(user_id),))
+        return f"{self.prefix}:{user_id}:{version}"
+
+    def get(self, user_id):
+        redis = get_redis_connection("default")
+        key = self._key(user_id)
+
+        members = {int(member) for member in redis.smembers(key)}
+        if FILLED_MARKER in members:
+            members.discard(FILLED_MARKER)
+            return members
+
+        # cold cache, fill from db and keep whatever writers added meanwhile
+        ids = set(self.loader(user_id))
+        pipe = redis.pipeline()
+        pipe.sadd(key, FILLED_MARKER, *ids)
+        pipe.expire(key, self.timeout)
+        pipe.execute()
+        return ids | members
+
+    def add(self, user_id, *ids):
+        """add ids after the current transaction commits"""
+        if not ids:
+            return
+
+        def _add():
+            redis = get_redis_connection("default")
+            key = self._key(user_id)
+            pipe = redis.pipeline()
+            pipe.sadd(key, *ids)
+            pipe.expire(key, self.timeout)
+            pipe.execute()
+
+        transaction.on_commit(_add)
+
+    def invalidate(self, user_id):
+        # after the transaction commits
+        bump_catalog_tags(self._tag(user_id))
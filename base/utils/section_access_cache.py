@@ -0,0 +1,13 @@
+from apps.course_app.models import StudentAccessSection
+from base.utils.redis_set_cache import UserIdSetCache
+
+
+def _load_access_section_ids(user_id):
+    return StudentAccessSection.objects.filter(
+        student__user_id=user_id,
+        is_access=True,
+    ).values_list("section_id", flat=True)
+
+
+# unlocked section ids per user
+section_access_cache = UserIdSetCache("section_access", _load_access_section_ids)
@@ -0,0 +1,14 @@
+from apps.challenge_app.models import ChallengeSubmission
+from base.utils.redis_set_cache import UserIdSetCache
+
+
+def _load_solved_challenge_ids(user_id):
+    return ChallengeSubmission.objects.filter(
+        user_id=user_id,
+        is_active=True,
+        status="accepted",
+    ).values_list("challenge_id", flat=True)
+
+
+# accepted challenge ids per user
+solved_challenge_cache = UserIdSetCache("solved_challenges", _load_solved_challenge_ids)
@@ -0,0 +1,30 @@
+from decouple import config
+from django.db import connection, transaction
+
+from apps.subscription_app.models import UserSubscription
+from base.utils.entitlement_cache import invalidate_entitlements
+
+EXPIRY_BATCH_SIZE = config("SUBSCRIPTION_EXPIRY_BATCH_SIZE", cast=int, default=1000)
+
+
+def expire_subscriptions_batch(batch_size=EXPIRY_BATCH_SIZE):
+    """active subscriptions past their end_date --> expired, at most batch_size rows per call"""
+    table = UserSubscription._meta.db_table
+    # a range scan of user_subscription_expiry_idx, rows locked by a running verify are left for the next run
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} SET status = 'expired', updated_at = NOW()
+            WHERE id IN (
+                SELECT id FROM {table}
+                WHERE status = 'active' AND is_active AND end_date < NOW()
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING user_id
+            """,
+            [batch_size],
+        )
+        user_ids = [row[0] for row in cursor.fetchall()]
+        invalidate_entitlements(*set(user_ids))
+    return len(user_ids)